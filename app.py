@@ -1,26 +1,150 @@
-from flask import Flask, render_template, request, jsonify, send_file, Response
+from flask import Flask, render_template, request, jsonify, Response
 import os
 import json
 import re
 import textwrap
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape as xml_escape
 import zipfile
 import io
+import csv
+import hashlib
+import sqlite3
+import threading
+import zlib
+import contextvars
+from collections import namedtuple, deque, Counter
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import time
+import uuid
+import random
+import heapq
+import math
+from fractions import Fraction
+from email.utils import parsedate_to_datetime
+from functools import partial
+
+try:
+    import orjson
+except ImportError:  # optional: faster parsing of replies that are already valid JSON
+    orjson = None
+
+json_loads = orjson.loads if orjson else json.loads
 
 app = Flask(__name__)
 
 # Configuration
-API_KEY = "your_perplexity_key:)"
+API_KEY = os.environ.get("PPLX_API_KEY", "your_perplexity_key:)")
 MODEL = "sonar"
 MAX_TOKENS = 900
 TEMPERATURE = 0.3
+# Point PPLX_BASE_URL at any OpenAI-compatible server, e.g. benchmarks/pplx_standin.py
+PPLX_BASE_URL = os.environ.get("PPLX_BASE_URL", "https://api.perplexity.ai")
+PPLX_API_URL = PPLX_BASE_URL.rstrip("/") + "/chat/completions"
+# Shared HTTP client: pooled keep-alive connections, (connect, read) timeouts in seconds
+HTTP_POOL_SIZE = int(os.environ.get("MCQ_HTTP_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.environ.get("MCQ_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("MCQ_READ_TIMEOUT", "120"))
+# Process-wide API quota shared by every job (0 = unlimited)
+RATE_LIMIT_RPM = int(os.environ.get("MCQ_RATE_LIMIT_RPM", "50"))
+RATE_LIMIT_TPM = int(os.environ.get("MCQ_RATE_LIMIT_TPM", "0"))
+# Retries for 429 / 5xx / connection errors: exponential backoff with jitter, honouring Retry-After
+MAX_RETRIES = int(os.environ.get("MCQ_MAX_RETRIES", "4"))
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Hedged requests: if a call has not returned by the HEDGE_PERCENTILE of recent latencies
+# for its model, send a duplicate and keep whichever finishes first. Duplicates are capped
+# at HEDGE_MAX_FRACTION of calls to bound the extra spend.
+HEDGE_ENABLED = os.environ.get("MCQ_HEDGE", "0") != "0"
+HEDGE_PERCENTILE = 0.9
+HEDGE_MAX_FRACTION = float(os.environ.get("MCQ_HEDGE_MAX_FRACTION", "0.1"))
+HEDGE_MIN_SAMPLES = 20                      # latencies needed before hedging a model
+HEDGE_MIN_DELAY = 1.0                       # never hedge sooner than this, seconds
+# Default wall-clock budget for a whole job in seconds (None = no deadline); /process
+# and the CLI can override it per job
+JOB_TIME_BUDGET = float(os.environ["MCQ_JOB_TIME_BUDGET"]) if os.environ.get("MCQ_JOB_TIME_BUDGET") else None
+# Most questions a /process request may ask for
+MAX_QUESTIONS = int(os.environ.get("MCQ_MAX_QUESTIONS", "200"))
+# Raw replies that could not be parsed are saved here for inspection (None, or
+# MCQ_DEBUG_RAW_DIR set to an empty string, disables)
+DEBUG_RAW_DIR = os.environ.get("MCQ_DEBUG_RAW_DIR", "debug_raw")
+DEBUG_RAW_DIR = Path(DEBUG_RAW_DIR) if DEBUG_RAW_DIR else None
+# Ask for token-streamed completions so questions can be parsed as they arrive
+STREAM_COMPLETIONS = os.environ.get("MCQ_STREAM_COMPLETIONS", "1") != "0"
+# Clean captions before chunking: rolling repeats, [Music]-style tags, filler words
+NORMALIZE_TRANSCRIPT = os.environ.get("MCQ_NORMALIZE_TRANSCRIPT", "1") != "0"
+FILLER_WORDS = {
+    "en": ("um", "umm", "uh", "uhh", "uh-huh", "erm", "hmm", "mhm"),
+    "lv": ("ēē", "ēēē", "eee", "mmm", "hmm", "ee"),
+    "de": ("äh", "ähm", "öh", "öhm", "hm", "hmm"),
+    "ru": ("э", "ээ", "эээ", "эм", "хм", "ммм"),
+}
+# Words that are fillers only as an interjection set off by commas ("so, like, the
+# ...") and real words otherwise ("I like it", "the ER")
+FILLER_INTERJECTIONS = {
+    "en": ("like", "so", "well", "er", "ah"),
+    "lv": ("nu", "nuu", "tā", "ē"),
+    "de": ("also", "na"),
+    "ru": ("ну", "вот", "типа", "короче"),
+}
+# Rank chunks by TF-IDF density before generating, so a small quota goes to the most
+# informative, mutually different chunks instead of the first ones
+CHUNK_SELECTION = os.environ.get("MCQ_CHUNK_SELECTION", "1") != "0"
+CHUNK_DIVERSITY = 0.3                       # 0 = density only, 1 = dissimilarity only
+# Words typical of intros, outros and sponsor reads; chunks full of them rank lower
+BOILERPLATE_WORDS = frozenset(
+    "subscribe subscribed subscribing channel like likes comment comments bell notification notifications "
+    "sponsor sponsored sponsors patreon merch discount code link links description welcome thanks thank "
+    "watching video videos episode abonē abonēt kanāls kanālu sponsors atlaide saite paldies".split())
+# Optional extractive compression: send each call only the highest-ranked sentences of
+# its chunk, about COMPRESS_TOKENS_PER_QUESTION tokens per question asked (off by default)
+COMPRESS_CHUNKS = os.environ.get("MCQ_COMPRESS_CHUNKS", "0") != "0"
+COMPRESS_TOKENS_PER_QUESTION = int(os.environ.get("MCQ_COMPRESS_TOKENS_PER_QUESTION", "350"))
+COMPRESS_MIN_TOKENS = 400
+# Packing mode: several chunks, as numbered sections, share one request up to
+# PACK_MAX_TOKENS of text; sections the reply gets wrong are retried on their own
+PACK_CHUNKS = os.environ.get("MCQ_PACK_CHUNKS", "0") != "0"
+PACK_MAX_TOKENS = int(os.environ.get("MCQ_PACK_MAX_TOKENS", "6000"))
+PACK_MAX_SECTIONS = 6
+# Chunks a transcript is split into (at most; fewer for short ones), whatever the number
+# of questions asked for; see split_into_target_chunks
+TARGET_CHUNKS = 12
+# Smallest chunk worth a request, in estimated tokens (~1000 characters)
+MIN_CHUNK_TOKENS = 250
+# Max simultaneous Perplexity requests per job; tune to the account's rate limits
+MAX_CONCURRENCY = int(os.environ.get("MCQ_MAX_CONCURRENCY", "4"))
+# Extra rounds that re-request a question shortfall after the first pass (0 disables)
+TOPUP_ROUNDS = int(os.environ.get("MCQ_TOPUP_ROUNDS", "2"))
+# Questions with the same correct answer whose word-bigram Jaccard similarity reaches this are duplicates (0 disables)
+DEDUP_THRESHOLD = float(os.environ.get("MCQ_DEDUP_THRESHOLD", "0.5"))
+
+# Background job queue for /process
+JOB_WORKERS = int(os.environ.get("MCQ_JOB_WORKERS", "2"))
+JOB_TTL = 3600                              # seconds a finished job stays queryable
+PROGRESS_BUFFER_SIZE = 1000                 # events kept per job for late/resuming readers
+SSE_HEARTBEAT = 15                          # seconds between keep-alive comments on idle streams
+
+# On-disk caches
+CACHE_DIR = Path(os.environ.get("MCQ_CACHE_DIR", "cache"))
+TRANSCRIPT_CACHE_TTL = 7 * 24 * 3600        # fetched transcripts
+TRANSCRIPT_NEGATIVE_TTL = 30 * 60           # "disabled" / "not_found" answers
+TRANSCRIPT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+LLM_CACHE_ENABLED = os.environ.get("MCQ_LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = 30 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 100 * 1024 * 1024
+QUESTION_CACHE_MAX_BYTES = 50 * 1024 * 1024  # validated questions per chunk, reused by later jobs
+QUESTION_CACHE_PER_CHUNK = 50
+RESULT_TTL = 7 * 24 * 3600                  # finished job results served by /download
+RESULT_STORE_MAX_BYTES = 100 * 1024 * 1024
 
-progress_updates = []
+# Job whose event channel emit_progress() publishes to; set per worker thread
+current_job = contextvars.ContextVar("current_job", default=None)
 
 
 
@@ -35,10 +159,153 @@ def extract_video_id(url: str) -> str:
         return q.path.lstrip("/")
     raise ValueError(f"Invalid YouTube URL: {url}")
 
+Segment = namedtuple("Segment", ["text", "start", "duration"])
+
+class DiskCache:
+    """SQLite-backed bytes store with per-entry TTL and LRU eviction by total size"""
+    
+    def __init__(self, path, max_bytes, default_ttl=None):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+    
+    def _db(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " expires REAL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+            self._conn = conn
+        return self._conn
+    
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                if row is not None:
+                    db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    db.commit()
+                self.misses += 1
+                return None
+            db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+            return row[0]
+    
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        expires = now + ttl if ttl else None
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), expires, now)
+            )
+            self._evict(db, now)
+            db.commit()
+    
+    def delete(self, key):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            db.commit()
+    
+    def _evict(self, db, now):
+        db.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        db.executemany("DELETE FROM entries WHERE key = ?", victims)
+    
+    def stats(self):
+        with self._lock:
+            count, size = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'entries': count, 'bytes': size, 'hits': self.hits, 'misses': self.misses}
+
+transcript_cache = DiskCache(CACHE_DIR / "transcripts.sqlite3", TRANSCRIPT_CACHE_MAX_BYTES,
+                             default_ttl=TRANSCRIPT_CACHE_TTL)
+llm_cache = DiskCache(CACHE_DIR / "llm.sqlite3", LLM_CACHE_MAX_BYTES, default_ttl=LLM_CACHE_TTL)
+question_cache = DiskCache(CACHE_DIR / "questions.sqlite3", QUESTION_CACHE_MAX_BYTES,
+                           default_ttl=LLM_CACHE_TTL)
+result_store = DiskCache(CACHE_DIR / "results.sqlite3", RESULT_STORE_MAX_BYTES, default_ttl=RESULT_TTL)
+
+def store_result(mcqs):
+    """Save an MCQ list to result_store as zlib-compressed JSON; returns its content-hash id"""
+    raw = json.dumps(mcqs, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    result_id = hashlib.sha256(raw).hexdigest()[:32]
+    result_store.set(result_id, zlib.compress(raw))
+    return result_id
+
+def load_result(result_id):
+    """MCQ list stored under result_id, or None once it has expired or been evicted"""
+    blob = result_store.get(result_id)
+    return None if blob is None else json.loads(zlib.decompress(blob).decode("utf-8"))
+
+def pack_segments(segments):
+    """Serialize segments as zlib-compressed JSON rows of [start, duration, text]"""
+    rows = [[round(s.start, 3), round(s.duration or 0, 3), s.text] for s in segments]
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def unpack_segments(blob):
+    """Inverse of pack_segments"""
+    rows = json.loads(zlib.decompress(blob).decode("utf-8"))
+    return [Segment(text, start, duration) for start, duration, text in rows]
+
 def get_transcript(url: str, preferred_langs=("lv", "en")):
-    """Get transcript from YouTube video using the new API interface"""
+    """Get transcript from YouTube, served from the on-disk cache when possible.
+    
+    A lookup entry maps (video id, preferred languages) to the resolved
+    language, whose segments are stored under (video id, language). Negative
+    "disabled"/"not_found" results are cached for TRANSCRIPT_NEGATIVE_TTL.
+    """
     vid = extract_video_id(url)
+    lookup_key = f"lookup:{vid}:{','.join(preferred_langs)}"
+    
+    cached = transcript_cache.get(lookup_key)
+    if cached is not None:
+        entry = json.loads(cached)
+        if entry.get("status"):
+            return None, None, entry["status"]
+        blob = transcript_cache.get(f"segments:{vid}:{entry['language']}")
+        if blob is not None:
+            return unpack_segments(blob), entry["language"], entry["source"]
     
+    segments, language, source = fetch_transcript(vid, preferred_langs)
+    return store_transcript(vid, preferred_langs, segments, language, source)
+
+def store_transcript(vid, preferred_langs, segments, language, source):
+    """Record a fetch result in transcript_cache; returns it with segments as Segment tuples"""
+    lookup_key = f"lookup:{vid}:{','.join(preferred_langs)}"
+    if segments is not None:
+        segments = [Segment(s.text, s.start, s.duration) for s in segments]
+        transcript_cache.set(f"segments:{vid}:{language}", pack_segments(segments))
+        transcript_cache.set(lookup_key, json.dumps({'language': language, 'source': source}).encode())
+    elif source.startswith(("disabled", "not_found")):
+        transcript_cache.set(lookup_key, json.dumps({'status': source}).encode(),
+                             ttl=TRANSCRIPT_NEGATIVE_TTL)
+    return segments, language, source
+
+def fetch_transcript(vid: str, preferred_langs=("lv", "en")):
+    """Get transcript from YouTube video using the new API interface"""
     try:
         # Use the NEW interface - create instance and call list()
         api = YouTubeTranscriptApi()
@@ -82,9 +349,44 @@ def get_transcript(url: str, preferred_langs=("lv", "en")):
     
     return None, None, "not_found: No accessible transcripts found"
 
+class EventChannel:
+    """Bounded, numbered event log for one job.
+    
+    Readers block on a condition variable until an event newer than the last
+    id they saw is published or the channel is closed; once the ring buffer
+    is full the oldest events are dropped.
+    """
+    
+    def __init__(self, maxlen=PROGRESS_BUFFER_SIZE):
+        self._events = deque(maxlen=maxlen)
+        self._next_id = 1
+        self._cond = threading.Condition()
+        self.closed = False
+    
+    def publish(self, event, name=None):
+        """Append an event; ``name`` becomes the SSE event type (default 'message')"""
+        with self._cond:
+            event_id = self._next_id
+            self._next_id += 1
+            self._events.append((event_id, name, event))
+            self._cond.notify_all()
+        return event_id
+    
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+    
+    def read(self, after_id=0, timeout=None):
+        """Events with id > after_id, waiting up to timeout for one to arrive; also returns closed"""
+        with self._cond:
+            if not self.closed and (not self._events or self._events[-1][0] <= after_id):
+                self._cond.wait(timeout)
+            events = [item for item in self._events if item[0] > after_id]
+            return events, self.closed
+
 def emit_progress(step, status, message, details=None):
-    """Emit progress update"""
-    global progress_updates
+    """Emit progress update to the current job's event channel"""
     update = {
         'step': step,
         'status': status,  # 'success', 'error', 'processing'
@@ -92,9 +394,17 @@ def emit_progress(step, status, message, details=None):
         'details': details,
         'timestamp': datetime.now().isoformat()
     }
-    progress_updates.append(update)
+    job = current_job.get()
+    if job is not None:
+        job.events.publish(update)
     return update
 
+def emit_questions(chunk_index, questions):
+    """Stream a chunk's validated questions to the current job as an 'mcqs' event"""
+    job = current_job.get()
+    if job is not None and questions:
+        job.events.publish({'chunk': chunk_index, 'mcqs': questions}, name="mcqs")
+
 def segments_to_plain_text(segments, join_threshold=0.8):
     """Convert transcript segments to plain text (from working notebook)"""
     out, buf, last_end = [], [], None
@@ -115,76 +425,532 @@ def segments_to_plain_text(segments, join_threshold=0.8):
         out.append(" ".join(buf))
     return "\n\n".join(out)
 
-def split_into_chunks(text: str, max_chars: int = 8000, target_chunks=None):
-    """Split text into manageable chunks"""
+NON_SPEECH_RE = re.compile(r"\[[^\]]*\]|[♪♫]+|\((?:music|applause|laughter|laughs|inaudible|silence)\)", re.I)
+# Stutters: a 2-4 word phrase said twice or more, or one word said three times or more.
+# Only letters count, so "1 0 0 1" and "had had" are left alone
+REPEATED_PHRASE_RE = re.compile(
+    r"\b((?:[^\W\d_]+\s+){1,3}[^\W\d_]+)(?:\s+\1\b)+|\b([^\W\d_]+)(?:\s+\2\b){2,}", re.I)
+
+def normalize_segments(segments, lang=None):
+    """Strip caption noise that costs prompt tokens but carries no content.
+    
+    Drops non-speech tags ([Music], ♪, (applause)), the language's filler
+    words (FILLER_INTERJECTIONS only when set off by commas at the start of
+    a clause) and immediately repeated phrases, removes the words a rolling
+    auto-caption line repeats from the end of the previous line, and
+    collapses whitespace. Timings are kept; segments left empty are dropped.
+    """
+    base = (lang or "").split("-")[0]
+    fillers = frozenset(FILLER_WORDS.get(base, ()))
+    interjections = frozenset(FILLER_INTERJECTIONS.get(base, ()))
+    out, prev = [], []
+    for s in segments:
+        text = (s.text or "").replace("\n", " ")
+        if "[" in text or "(" in text or "♪" in text or "♫" in text:
+            text = NON_SPEECH_RE.sub(" ", text)
+        words, lowered = [], []
+        before = ""  # the previous word of the line as written, "" at its start
+        for w in text.split():
+            low = w.lower()
+            bare = low.rstrip(",.")
+            isolated = bare in interjections and low.endswith(",") and (not before or before[-1] in ",.!?")
+            before = w
+            if bare not in fillers and not isolated:
+                words.append(w)
+                lowered.append(low)
+        # Longest prefix of this line that repeats the end of the previous one
+        for k in range(min(len(words), len(prev)), 0, -1):
+            if lowered[:k] == prev[-k:] and (k > 1 or k == len(words)):
+                words = words[k:]
+                break
+        if not words:
+            continue
+        prev = lowered[len(lowered) - len(words):]
+        text = " ".join(words)
+        if len(set(prev)) < len(prev):  # a repeated phrase needs a repeated word
+            text = REPEATED_PHRASE_RE.sub(lambda m: m.group(1) or m.group(2), text)
+        out.append(Segment(text, s.start, s.duration))
+    return out
+
+SENTENCE_END_RE = re.compile(r"[.!?\u2026]+[\"')\]]*(?=\s)")
+TOKEN_SAMPLE_CHARS = 50000
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE token count: ~4 characters or ~3/4 of a word per token, whichever is more"""
+    return max(len(text) // 4, len(text.split()) * 4 // 3)
+
+def split_into_chunks(text: str, max_chars: int = 8000, target_chunks=None, max_tokens=None):
+    """Split text into chunks of at most ``max_tokens`` estimated tokens (or ``max_chars``).
+    
+    A single left-to-right pass: each cut is searched for only in the last
+    half of the current budget window, and consecutive windows never
+    overlap, so every character is scanned at most once. Cuts prefer a pause
+    (the blank line segments_to_plain_text puts between caption groups),
+    then a sentence end, then any whitespace, so unpunctuated auto-captions
+    still split cleanly instead of becoming one oversized chunk.
+    """
+    if not text.strip():
+        return []
+    if max_tokens:
+        # Convert the token budget with this text's own chars-per-token ratio
+        sample = text[:TOKEN_SAMPLE_CHARS]
+        max_chars = max(1, int(max_tokens * len(sample) / max(1, estimate_tokens(sample))))
     if target_chunks:
         actual_chunk_size = len(text) // target_chunks
         max_chars = max(1000, actual_chunk_size)
     
-    paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-    chunks, buf, cur = [], [], 0
+    chunks = []
+    start, n = 0, len(text)
+    while start < n:
+        limit = start + max_chars
+        if limit >= n:
+            end = n
+        else:
+            floor = start + max_chars // 2
+            end = text.rfind("\n\n", floor, limit)
+            if end == -1:
+                for m in SENTENCE_END_RE.finditer(text, floor, limit):
+                    end = m.end()
+            if end == -1:
+                end = text.rfind(" ", floor, limit)
+            if end <= start:
+                end = limit
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append(piece)
+        start = end
+    return chunks
+
+def split_into_target_chunks(text, target_chunks, min_tokens=None):
+    """split_into_chunks with the smallest token budget giving at most ``target_chunks`` chunks.
     
-    for p in paras:
-        if cur + len(p) + 2 <= max_chars:
-            buf.append(p)
-            cur += len(p) + 2
+    Cuts land between half and all of the budget, so an even share of the
+    text's tokens yields up to twice the target; the budget is binary-searched
+    from there to within 2%. Budgets stay at or above ``min_tokens`` (default
+    MIN_CHUNK_TOKENS), so short texts give fewer chunks. Returns (chunks, budget).
+    """
+    min_tokens = MIN_CHUNK_TOKENS if min_tokens is None else min_tokens
+    lo = max(min_tokens, -(-estimate_tokens(text) // max(1, target_chunks)))
+    best = split_into_chunks(text, max_tokens=lo)
+    if len(best) <= target_chunks:
+        return best, lo
+    hi = lo
+    while len(best) > target_chunks:
+        lo, hi = hi, hi * 2
+        best = split_into_chunks(text, max_tokens=hi)
+    while hi - lo > max(1, hi // 50):
+        mid = (lo + hi) // 2
+        chunks = split_into_chunks(text, max_tokens=mid)
+        if len(chunks) <= target_chunks:
+            hi, best = mid, chunks
         else:
-            if buf:
-                chunks.append("\n\n".join(buf))
-            buf = [p]
-            cur = len(p) + 2
-            
-            if cur > max_chars:
-                sentences = re.split(r'[.!?]+', p)
-                temp_chunk = ""
-                for sent in sentences:
-                    if len(temp_chunk) + len(sent) < max_chars:
-                        temp_chunk += sent + ". "
-                    else:
-                        if temp_chunk.strip():
-                            chunks.append(temp_chunk.strip())
-                        temp_chunk = sent + ". "
-                if temp_chunk.strip():
-                    buf = [temp_chunk.strip()]
-                    cur = len(temp_chunk)
-                else:
-                    buf = []
-                    cur = 0
+            lo = mid
+    return best, hi
+
+def llm_cache_key(model, messages, max_tokens, temperature):
+    """Content hash identifying a chat completion request"""
+    raw = json.dumps([model, messages, max_tokens, temperature],
+                     ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return "chat:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def chunk_questions_key(chunk_text, lang, model):
+    """Content hash identifying a chunk's questions in question_cache"""
+    raw = json.dumps([chunk_text, lang, model], ensure_ascii=False, separators=(",", ":"))
+    return "chunk:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def load_chunk_questions(chunk_text, lang, model):
+    """Validated questions earlier jobs generated for this chunk ([] if none)"""
+    blob = question_cache.get(chunk_questions_key(chunk_text, lang, model))
+    return [] if blob is None else json.loads(zlib.decompress(blob).decode("utf-8"))
+
+def save_chunk_questions(chunk_text, lang, model, questions):
+    questions = questions[:QUESTION_CACHE_PER_CHUNK]
+    question_cache.set(chunk_questions_key(chunk_text, lang, model),
+                       zlib.compress(json.dumps(questions, ensure_ascii=False).encode("utf-8")))
+
+_pplx_session = None
+_pplx_session_lock = threading.Lock()
+
+def get_pplx_session():
+    """Process-wide keep-alive session for the Perplexity API, created on first use.
     
-    if buf:
-        chunks.append("\n\n".join(buf))
-    return chunks
+    The connection pool holds up to HTTP_POOL_SIZE sockets and blocks rather
+    than opening throwaway connections when every socket is busy, so the
+    session can be shared by all jobs and chunk worker threads.
+    """
+    global _pplx_session
+    if _pplx_session is None:
+        with _pplx_session_lock:
+            if _pplx_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "Authorization": f"Bearer {API_KEY}",
+                    "Content-Type": "application/json"
+                })
+                _pplx_session = session
+    return _pplx_session
 
-def call_pplx(model: str, messages, max_tokens=900, temperature=0.3, timeout=120):
-    """Call Perplexity API"""
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared by all threads.
+    
+    Each bucket holds up to one minute of allowance and refills continuously.
+    A 429 from the API pauses every caller until its Retry-After has passed.
+    """
+    
+    def __init__(self, rpm=0, tpm=0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+    
+    def acquire(self, tokens=0, deadline=None):
+        """Block until one request and ``tokens`` tokens are available, then take them.
+        
+        Raises DeadlineExceeded instead of waiting past ``deadline``.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                tokens = min(tokens, self.tpm) if self.tpm else 0
+                wait_for = self._paused_until - now
+                if self.rpm and self._requests < 1:
+                    wait_for = max(wait_for, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait_for = max(wait_for, (tokens - self._tokens) * 60 / self.tpm)
+                if wait_for <= 0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+            left = time_left(deadline)
+            if left is not None and left < wait_for:
+                raise DeadlineExceeded()
+            time.sleep(wait_for)
+    
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+rate_limiter = RateLimiter(RATE_LIMIT_RPM, RATE_LIMIT_TPM)
+
+def retry_delay(attempt, response=None):
+    """Seconds to wait before retry ``attempt`` (1-based): Retry-After if given, else backoff with jitter"""
+    header = response.headers.get("Retry-After") if response is not None else None
+    if header:
+        try:
+            return min(RETRY_MAX_DELAY, max(0.0, float(header)))
+        except ValueError:
+            try:
+                return min(RETRY_MAX_DELAY, max(0.0, parsedate_to_datetime(header).timestamp() - time.time()))
+            except (TypeError, ValueError):
+                pass
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class RequestCancelled(Exception):
+    """A call was abandoned because a hedged duplicate already answered"""
+
+class DeadlineExceeded(Exception):
+    """The job's time budget ran out before the call could complete"""
+
+def time_left(deadline):
+    """Seconds until a time.monotonic() deadline (None when there is no deadline)"""
+    return None if deadline is None else deadline - time.monotonic()
+
+def call_timeout(timeout, deadline):
+    """Read timeout for the next call: the configured one, shrunk to the time left before the deadline"""
+    timeout = timeout or READ_TIMEOUT
+    left = time_left(deadline)
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(timeout, left)
+
+def post_pplx(payload, timeout=None, stream=False, on_retry=None, cancel=None, deadline=None):
+    """POST a chat completion through the shared rate limiter, retrying 429/5xx and connection errors.
+    
+    ``on_retry(attempt, delay, reason)`` is called before each retry. The
+    final failure is raised as from raise_for_status / requests. Setting the
+    ``cancel`` event stops further attempts with RequestCancelled. With a
+    ``deadline`` the read timeout shrinks to the time left, and waits or
+    retries that cannot finish in time raise DeadlineExceeded.
+    """
+    prompt = "".join(str(m.get("content", "")) for m in payload["messages"])
+    tokens = estimate_tokens(prompt) + payload.get("max_tokens", 0)
+    attempt = 0
+    while True:
+        rate_limiter.acquire(tokens, deadline=deadline)
+        if cancel is not None and cancel.is_set():
+            raise RequestCancelled()
+        try:
+            r = get_pplx_session().post(
+                PPLX_API_URL,
+                data=json.dumps(payload),
+                timeout=(CONNECT_TIMEOUT, call_timeout(timeout, deadline)),
+                stream=stream
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= MAX_RETRIES:
+                raise
+            if deadline is not None and time_left(deadline) <= 0:
+                raise DeadlineExceeded() from e
+            attempt += 1
+            delay, reason = retry_delay(attempt), type(e).__name__
+        else:
+            if r.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                r.raise_for_status()
+                return r
+            attempt += 1
+            delay, reason = retry_delay(attempt, r), f"HTTP {r.status_code}"
+            if r.status_code == 429:
+                rate_limiter.pause(delay)
+            r.close()
+        left = time_left(deadline)
+        if left is not None and left < delay:
+            raise DeadlineExceeded()
+        if on_retry:
+            on_retry(attempt, delay, reason)
+        time.sleep(delay)
+
+def call_pplx(model: str, messages, max_tokens=900, temperature=0.3, timeout=None, use_cache=True,
+              on_retry=None, cancel=None, deadline=None):
+    """Call Perplexity API; identical requests are answered from llm_cache unless use_cache is False"""
+    key = None
+    if use_cache and LLM_CACHE_ENABLED:
+        key = llm_cache_key(model, messages, max_tokens, temperature)
+        blob = llm_cache.get(key)
+        if blob is not None:
+            data = json.loads(zlib.decompress(blob).decode("utf-8"))
+            data["cached"] = True
+            return data["choices"][0]["message"]["content"], data
+    
     payload = {
         "model": model,
         "messages": messages,
         "max_tokens": max_tokens,
         "temperature": temperature
     }
-    r = requests.post(
-        "https://api.perplexity.ai/chat/completions",
-        headers=headers,
-        data=json.dumps(payload),
-        timeout=timeout
-    )
-    r.raise_for_status()
+    r = post_pplx(payload, timeout=timeout, on_retry=on_retry, cancel=cancel, deadline=deadline)
     data = r.json()
+    if key:
+        llm_cache.set(key, zlib.compress(r.content))
     return data["choices"][0]["message"]["content"], data
 
-def build_mcq_prompt(chunk_text: str, lang="lv", n=3):
-    """Build prompt for MCQ generation"""
+def call_pplx_stream(model: str, messages, max_tokens=900, temperature=0.3, timeout=None,
+                     use_cache=True, on_object=None, on_retry=None, cancel=None, deadline=None):
+    """Streamed variant of call_pplx that parses MCQ objects while tokens arrive.
+    
+    Each complete object is passed to ``on_object`` the moment its closing
+    brace is received. Returns (content, meta, objects); ``objects`` keeps every
+    complete object even when the reply was cut off by max_tokens. The
+    finished reply is stored in llm_cache in the same shape call_pplx uses.
+    """
+    parser = MCQStreamParser()
+    
+    def deliver(objects):
+        if on_object:
+            for obj in objects:
+                on_object(obj)
+    
+    key = None
+    if use_cache and LLM_CACHE_ENABLED:
+        key = llm_cache_key(model, messages, max_tokens, temperature)
+        blob = llm_cache.get(key)
+        if blob is not None:
+            data = json.loads(zlib.decompress(blob).decode("utf-8"))
+            data["cached"] = True
+            content = data["choices"][0]["message"]["content"]
+            deliver(parser.feed(content))
+            return content, data, parser.objects
+    
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": True
+    }
+    parts = []
+    finish_reason = None
+    last = {}
+    with post_pplx(payload, timeout=timeout, stream=True, on_retry=on_retry, cancel=cancel,
+                   deadline=deadline) as r:
+        for line in r.iter_lines():
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled()
+            if deadline is not None and time_left(deadline) <= 0:
+                raise DeadlineExceeded()
+            if not line.startswith(b"data:"):
+                continue
+            chunk = line[5:].strip()
+            if chunk == b"[DONE]":
+                break
+            last = json.loads(chunk)
+            choice = (last.get("choices") or [{}])[0]
+            delta = (choice.get("delta") or {}).get("content")
+            if delta:
+                parts.append(delta)
+                deliver(parser.feed(delta))
+            finish_reason = choice.get("finish_reason") or finish_reason
+    
+    content = "".join(parts)
+    data = {
+        "id": last.get("id"),
+        "model": last.get("model", model),
+        "choices": [{"index": 0, "finish_reason": finish_reason,
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": last.get("usage")
+    }
+    if key:
+        llm_cache.set(key, zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8")))
+    return content, data, parser.objects
+
+class LatencyTracker:
+    """Recent successful call latencies per model, plus call/hedge counts for the hedge budget"""
+    
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+        self._calls = {}
+        self._hedges = {}
+        self._lock = threading.Lock()
+    
+    def record(self, model, seconds):
+        """Count a call that reached the API and remember how long it took"""
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+            self._calls[model] = self._calls.get(model, 0) + 1
+    
+    def hedge_delay(self, model):
+        """Seconds after which a call to ``model`` gets a duplicate, or None if not hedging yet"""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, samples[int(HEDGE_PERCENTILE * (len(samples) - 1))])
+    
+    def try_hedge(self, model):
+        """Take one hedge from the budget; False when it would exceed HEDGE_MAX_FRACTION of calls"""
+        with self._lock:
+            hedges = self._hedges.get(model, 0)
+            if hedges + 1 > HEDGE_MAX_FRACTION * self._calls.get(model, 0):
+                return False
+            self._hedges[model] = hedges + 1
+            return True
+    
+    def stats(self):
+        with self._lock:
+            return {model: {'calls': self._calls.get(model, 0), 'hedges': self._hedges.get(model, 0),
+                            'samples': len(samples)}
+                    for model, samples in self._samples.items()}
+
+latency_tracker = LatencyTracker()
+hedge_executor = ThreadPoolExecutor(max_workers=2 * HTTP_POOL_SIZE, thread_name_prefix="pplx-hedge")
+
+def call_pplx_hedged(call, model, messages, on_object=None, **kwargs):
+    """Run ``call`` (call_pplx or call_pplx_stream), hedging it when HEDGE_ENABLED.
+    
+    If the call is still outstanding after latency_tracker.hedge_delay(model)
+    and the hedge budget allows, an identical request is started and the
+    first successful answer wins; the other is cancelled (a streamed loser
+    stops reading at once, a plain one is abandoned). For streamed calls the
+    first request to deliver a question owns the output, so questions are
+    never passed to ``on_object`` twice, and a call that is already
+    streaming questions is not hedged.
+    """
+    delay = latency_tracker.hedge_delay(model) if HEDGE_ENABLED else None
+    streaming = call is call_pplx_stream
+    if streaming:
+        kwargs["on_object"] = on_object
+    
+    if delay is None:
+        t0 = time.monotonic()
+        result = call(model, messages, **kwargs)
+        if not result[1].get("cached"):
+            latency_tracker.record(model, time.monotonic() - t0)
+        return result
+    
+    owner_lock = threading.Lock()
+    owner = []
+    
+    def attempt(tag, cancel):
+        def deliver(obj):
+            with owner_lock:
+                if not owner:
+                    owner.append(tag)
+            if owner[0] != tag:
+                cancel.set()
+            elif on_object:
+                on_object(obj)
+        
+        options = dict(kwargs, cancel=cancel)
+        if streaming:
+            options["on_object"] = deliver
+        t0 = time.monotonic()
+        result = call(model, messages, **options)
+        if not result[1].get("cached"):
+            latency_tracker.record(model, time.monotonic() - t0)
+        return tag, result
+    
+    cancels = {"primary": threading.Event()}
+    primary = hedge_executor.submit(contextvars.copy_context().run, attempt, "primary", cancels["primary"])
+    left = time_left(kwargs.get("deadline"))
+    done, _ = wait([primary], timeout=delay if left is None else max(0, min(delay, left)))
+    if done or owner or (left is not None and left <= delay) or not latency_tracker.try_hedge(model):
+        return primary.result()[1]
+    
+    emit_progress("generate_mcqs", "processing",
+                 f"Request slower than {delay:.1f}s (p{int(HEDGE_PERCENTILE * 100)} for {model}), sending a hedge")
+    cancels["hedge"] = threading.Event()
+    hedge = hedge_executor.submit(contextvars.copy_context().run, attempt, "hedge", cancels["hedge"])
+    
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            try:
+                tag, result = fut.result()
+            except Exception as e:
+                if not isinstance(e, RequestCancelled):
+                    error = e
+                continue
+            if owner and owner[0] != tag:
+                continue
+            for other in pending:
+                other.cancel()
+            for name, event in cancels.items():
+                if name != tag:
+                    event.set()
+            return result
+    raise error or RequestCancelled()
+
+def build_mcq_prompt(chunk_text: str, lang="lv", n=3, avoid=None):
+    """Build prompt for MCQ generation; ``avoid`` lists questions not to repeat"""
     prompts = {
         "lv": {
             "system": (
                 "Tu esi eksāmenu satura veidotājs. Izveido kvalitatīvus MCQ (viena pareizā atbilde) no dotā teksta. "
                 "Neizdomā faktus. Atbildei jābūt TIKAI derīgam JSON masīvam."
             ),
+            "avoid": "Šie jautājumi jau ir uzdoti - neatkārto tos un neuzdod tos pašus faktus citiem vārdiem:",
             "user_template": """
 Valoda: {lang}
 Jautājumu skaits: {n}
@@ -207,7 +973,7 @@ Formāts:
   }},
   ...
 ]
-
+{avoid}
 Teksts:
 {chunk_text}
 """
@@ -217,6 +983,7 @@ Teksts:
                 "You are an exam content creator. Create quality MCQs (one correct answer) from the given text. "
                 "Don't invent facts. Response must be ONLY valid JSON array."
             ),
+            "avoid": "These questions were already asked - don't repeat them or reword the same facts:",
             "user_template": """
 Language: {lang}
 Number of questions: {n}
@@ -239,7 +1006,7 @@ Format:
   }},
   ...
 ]
-
+{avoid}
 Text:
 {chunk_text}
 """
@@ -247,35 +1014,415 @@ Text:
     }
     
     prompt_set = prompts.get(lang, prompts["en"])
+    avoid_block = ""
+    if avoid:
+        avoid_block = "\n" + prompt_set["avoid"] + "\n" + "".join(f"- {q}\n" for q in avoid)
     system = {"role": "system", "content": prompt_set["system"]}
     user = {
         "role": "user", 
         "content": prompt_set["user_template"].format(
-            lang=lang, n=n, chunk_text=chunk_text
+            lang=lang, n=n, chunk_text=chunk_text, avoid=avoid_block
         ).strip()
     }
     return [system, user]
 
-def parse_json_repair(s: str):
-    """Repair and parse JSON with common issues"""
-    t = s.strip().replace("\r\n", "\n")
+def build_packed_prompt(sections, lang="lv"):
+    """Build one prompt for several chunks; ``sections`` is a list of (chunk_text, n, avoid).
     
-    # Remove trailing commas before ] or }
-    t = re.sub(r",\s*([\]}])", r"\1", t)
+    The reply is a JSON object mapping the section ids S1, S2, ... to arrays
+    in the build_mcq_prompt format.
+    """
+    prompts = {
+        "lv": {
+            "system": (
+                "Tu esi eksāmenu satura veidotājs. Izveido kvalitatīvus MCQ (viena pareizā atbilde) no dotā teksta. "
+                "Neizdomā faktus. Atbildei jābūt TIKAI derīgam JSON objektam."
+            ),
+            "avoid": "Šie jautājumi jau ir uzdoti - neatkārto tos un neuzdod tos pašus faktus citiem vārdiem:",
+            "section": "Sadaļa {sid} - jautājumu skaits: {n}",
+            "user_template": """
+Valoda: {lang}
+
+Teksts ir sadalīts sadaļās. Katrai sadaļai izveido norādīto jautājumu skaitu tikai no tās sadaļas teksta.
+
+Stingras prasības:
+- Atgriez TIKAI JSON objektu, kura atslēgas ir sadaļu apzīmējumi ({ids}), bet vērtības - jautājumu masīvi.
+- Izmanto dubultpēdiņas gan atslēgām, gan virkņu vērtībām.
+- Nav lieku komatu rindas beigās.
+- Nav komentāru vai papildlauku.
+- Ja sadaļā pietrūkst informācijas, tās masīvs ir tukšs [].
+
+Formāts:
+{{
+  "S1": [
+    {{
+      "question": "....",
+      "choices": {{"A":"...","B":"...","C":"...","D":"..."}},
+      "correct": "A",
+      "explanation": "Īss pamatojums no sadaļas teksta."
+    }}
+  ],
+  ...
+}}
+{sections}"""
+        },
+        "en": {
+            "system": (
+                "You are an exam content creator. Create quality MCQs (one correct answer) from the given text. "
+                "Don't invent facts. Response must be ONLY a valid JSON object."
+            ),
+            "avoid": "These questions were already asked - don't repeat them or reword the same facts:",
+            "section": "Section {sid} - number of questions: {n}",
+            "user_template": """
+Language: {lang}
+
+The text is split into sections. For each section write the requested number of questions from that section's text only.
+
+Strict requirements:
+- Return ONLY a JSON object whose keys are the section ids ({ids}) and whose values are arrays of questions.
+- Use double quotes for both keys and string values.
+- No trailing commas at end of lines.
+- No comments or additional fields.
+- If a section lacks information, its array is empty [].
+
+Format:
+{{
+  "S1": [
+    {{
+      "question": "....",
+      "choices": {{"A":"...","B":"...","C":"...","D":"..."}},
+      "correct": "A",
+      "explanation": "Brief justification from the section's text."
+    }}
+  ],
+  ...
+}}
+{sections}"""
+        }
+    }
     
-    # Convert single-quoted keys/values to double quotes
-    t = re.sub(r'(?P<pre>[\{\s,])\'(?P<key>[^\'\n\r\t]+)\'\s*:', r'\g<pre>"\g<key>":', t)
-    t = re.sub(r':\s*\'(?P<val>[^\'\\\n\r]*)\'(?P<post>[\s,\}\]])', r': "\g<val>"\g<post>', t)
+    prompt_set = prompts.get(lang, prompts["en"])
+    blocks = []
+    for k, (chunk_text, n, avoid) in enumerate(sections, 1):
+        block = "\n" + prompt_set["section"].format(sid=f"S{k}", n=n) + "\n"
+        if avoid:
+            block += prompt_set["avoid"] + "\n" + "".join(f"- {q}\n" for q in avoid)
+        blocks.append(block + f"[S{k}]\n{chunk_text}\n[/S{k}]\n")
+    system = {"role": "system", "content": prompt_set["system"]}
+    user = {
+        "role": "user",
+        "content": prompt_set["user_template"].format(
+            lang=lang, ids=", ".join(f"S{k}" for k in range(1, len(sections) + 1)), sections="".join(blocks)
+        ).strip()
+    }
+    return [system, user]
+
+JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+QUOTE_CLOSERS = {'"': '"”“', "'": "'", "“": '"”“', "”": '"”“', "„": '"”“'}
+LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+JSON_WS = frozenset(" \t\r\n")
+
+def quote_may_close(s, k):
+    """Could a quote just before position k end its string? None if ``s`` ends before that is known"""
+    n = len(s)
+    while k < n and s[k] in JSON_WS:
+        k += 1
+    if k >= n:
+        return None
+    if s[k] in ":}]" or s.startswith(("//", "/*"), k):
+        return True
+    if s[k] != ",":
+        return False
+    k += 1
+    while k < n and s[k] in JSON_WS:
+        k += 1
+    if k >= n:
+        return None
+    return (s[k] in "\"'“”„{[]}-" or s[k].isdigit()
+            or s.startswith(("true", "false", "null", "//", "/*"), k))
+
+class LenientJSONParser:
+    """Single-pass recursive-descent parser for JSON the way LLMs write it.
+    
+    Skips prose and code fences around the value and accepts single and
+    smart quotes, trailing or doubled commas, // and /* */ comments, Python
+    literals and unquoted words. A quote inside a string only ends it when
+    what follows could continue the JSON (``:``, ``}``, ``]``, or a comma
+    and then another value), so unescaped inner quotes stay in the text.
+    A truncated reply keeps every element completed before the cut:
+    unfinished objects and strings are dropped, unfinished arrays are kept.
+    """
+    
+    _stop_res = {q: re.compile("[\\\\" + re.escape(c) + "]") for q, c in QUOTE_CLOSERS.items()}
+    _bare_re = re.compile(r"[^\s,:\]\}]+")
+    _ws = JSON_WS
+    
+    def parse(self, text):
+        """The first JSON value in ``text``; raises ValueError if there is none or nothing survived truncation"""
+        s = self.s = text
+        self.n = len(s)
+        fence = s.find("```")
+        start = fence + 3 if fence != -1 and s.find("```", fence + 3) != -1 else 0
+        starts = [k for k in (s.find("[", start), s.find("{", start)) if k != -1]
+        if not starts:
+            raise ValueError("no JSON value in response")
+        self.i = min(starts)
+        value, complete = self._value()
+        if not complete and not value:
+            raise ValueError("truncated JSON response")
+        return value
+    
+    def _skip(self):
+        s, n, i = self.s, self.n, self.i
+        while i < n:
+            c = s[i]
+            if c in self._ws:
+                i += 1
+            elif c == "/" and s.startswith("//", i):
+                i = s.find("\n", i)
+                i = n if i == -1 else i
+            elif c == "/" and s.startswith("/*", i):
+                i = s.find("*/", i)
+                i = n if i == -1 else i + 2
+            else:
+                break
+        self.i = i
+    
+    def _value(self):
+        """(value, complete)"""
+        self._skip()
+        if self.i >= self.n:
+            return None, False
+        c = self.s[self.i]
+        if c == "{":
+            return self._object()
+        if c == "[":
+            return self._array()
+        if c in QUOTE_CLOSERS:
+            return self._string()
+        m = self._bare_re.match(self.s, self.i)
+        if m is None:  # no value where one belongs ("key": ,); the caller handles the delimiter
+            if c == ":":
+                self.i += 1
+                return self._value()
+            return None, True
+        self.i = m.end()
+        token = m.group()
+        if token in LITERALS:
+            return LITERALS[token], True
+        try:
+            return json.loads(token), self.i < self.n
+        except ValueError:
+            return token, self.i < self.n
+    
+    def _array(self):
+        self.i += 1
+        out = []
+        while True:
+            self._skip()
+            if self.i >= self.n:
+                return out, False
+            c = self.s[self.i]
+            if c == "]":
+                self.i += 1
+                return out, True
+            if c in ",}":
+                self.i += 1
+                continue
+            value, complete = self._value()
+            if complete or isinstance(value, list):
+                out.append(value)
+            if not complete:
+                return out, False
+    
+    def _object(self):
+        self.i += 1
+        out = {}
+        while True:
+            self._skip()
+            if self.i >= self.n:
+                return out, False
+            c = self.s[self.i]
+            if c == "}":
+                self.i += 1
+                return out, True
+            if c == "]":  # mismatched closer: end the object, let the array take it
+                return out, True
+            if c == ",":
+                self.i += 1
+                continue
+            if c in QUOTE_CLOSERS:
+                key, complete = self._string()
+            elif c == ":":  # a value without a key
+                self.i += 1
+                self._value()
+                continue
+            else:
+                m = self._bare_re.match(self.s, self.i)
+                self.i = m.end()
+                key, complete = m.group(), self.i < self.n
+            if not complete:
+                return out, False
+            self._skip()
+            if self.i < self.n and self.s[self.i] == ":":
+                self.i += 1
+            value, complete = self._value()
+            if complete or isinstance(value, list):
+                out[key] = value
+            if not complete:
+                return out, False
+    
+    def _string(self):
+        s, n = self.s, self.n
+        stop = self._stop_res[s[self.i]]
+        i = self.i + 1
+        buf = []
+        surrogates = False
+        while True:
+            m = stop.search(s, i)
+            if m is None:
+                self.i = n
+                return "".join(buf) + s[i:], False
+            j = m.start()
+            buf.append(s[i:j])
+            if s[j] == "\\":
+                if j + 1 >= n:
+                    self.i = n
+                    return "".join(buf), False
+                e = s[j + 1]
+                if e == "u" and re.fullmatch(r"[0-9a-fA-F]{4}", s[j + 2:j + 6]):
+                    code = int(s[j + 2:j + 6], 16)
+                    surrogates = surrogates or 0xD800 <= code <= 0xDFFF
+                    buf.append(chr(code))
+                    i = j + 6
+                else:
+                    buf.append(JSON_ESCAPES.get(e, e))
+                    i = j + 2
+                continue
+            if quote_may_close(s, j + 1) is not False:
+                self.i = j + 1
+                text = "".join(buf)
+                if surrogates:  # rejoin \u-escaped surrogate pairs
+                    text = text.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+                return text, True
+            buf.append(s[j])
+            i = j + 1
+
+def parse_llm_json(text):
+    """Parse the JSON value in an LLM reply.
     
-    # Isolate first array/object
-    fa, la = t.find("["), t.rfind("]")
-    fo, lo = t.find("{"), t.rfind("}")
-    if fa != -1 and la != -1 and fa < la:
-        t = t[fa:la+1]
-    elif fo != -1 and lo != -1 and fo < lo:
-        t = t[fo:lo+1]
+    Replies that are valid JSON, alone or wrapped in prose or a code fence,
+    take the fast path (orjson when installed); anything else goes through
+    LenientJSONParser in one pass. Raises ValueError when no value can be
+    recovered.
+    """
+    text = text.strip()
+    try:
+        return json_loads(text)
+    except ValueError:
+        pass
+    # Valid JSON wrapped in prose or a code fence
+    start = min((k for k in (text.find("["), text.find("{")) if k != -1), default=-1)
+    end = text.rfind("]" if start != -1 and text[start] == "[" else "}")
+    if 0 < start < end:
+        try:
+            return json_loads(text[start:end + 1])
+        except ValueError:
+            pass
+    return LenientJSONParser().parse(text)
+
+class MCQStreamParser:
+    """Incremental parser pulling complete objects out of a (possibly truncated) JSON array.
+    
+    Text before the opening bracket is skipped. Objects are parsed once their
+    closing brace arrives, so a reply cut off mid-object still yields every
+    object before the cut. A lone top-level object is handled the same way.
+    Strings follow LenientJSONParser: any of its quotes opens one, and a
+    closing quote only counts when quote_may_close() agrees.
+    """
+    
+    def __init__(self):
+        self.objects = []
+        self.started = False    # saw the opening '[' or '{'
+        self.finished = False   # the top-level value has been closed
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._base = 1
+        self._start = None
+        self._closers = None    # closing quotes of the string being read, if any
+        self._escape = False
+    
+    def feed(self, text):
+        """Consume more text; returns the objects completed by it"""
+        if self.finished:
+            return []
+        buf = self._buf + text
+        new = []
+        i = self._pos
+        while i < len(buf):
+            c = buf[i]
+            if self._closers:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c in self._closers:
+                    closes = quote_may_close(buf, i + 1)
+                    if closes is None:
+                        break  # decide once more text arrives
+                    if closes:
+                        self._closers = None
+            elif not self.started:
+                if c in "[{":
+                    self.started = True
+                    if c == "[":
+                        self._depth = 1
+                    else:
+                        self._base = 0
+                        continue  # reprocess as the first object's opening brace
+            elif c in QUOTE_CLOSERS:
+                self._closers = QUOTE_CLOSERS[c]
+            elif c in "[{":
+                if c == "{" and self._depth == self._base:
+                    self._start = i
+                self._depth += 1
+            elif c in "]}":
+                self._depth -= 1
+                if c == "}" and self._depth == self._base and self._start is not None:
+                    obj = self._parse_object(buf[self._start:i + 1])
+                    self._start = None
+                    if obj is not None:
+                        new.append(obj)
+                if self._depth < self._base or (self._base == 0 and self._depth == 0):
+                    self.finished = True
+                    break
+            i += 1
+        # Keep only the unfinished object (if any) for the next call
+        keep = self._start if self._start is not None else i
+        self._buf = buf[keep:]
+        self._pos = i - keep
+        if self._start is not None:
+            self._start = 0
+        self.objects.extend(new)
+        return new
     
-    return json.loads(t)
+    @staticmethod
+    def _parse_object(text):
+        try:
+            obj = parse_llm_json(text)
+        except ValueError:
+            return None
+        return obj if isinstance(obj, dict) else None
+
+def parse_mcq_content(content):
+    """Parse a complete reply into a list (whole objects only if it was truncated); ValueError if unusable"""
+    parsed = parse_llm_json(content)
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    if not isinstance(parsed, list):
+        return []
+    return parsed
 
 def validate_mcq_list(mcq_list):
     """Validate MCQ format"""
@@ -306,50 +1453,631 @@ def validate_mcq_list(mcq_list):
             issues.append((i, "empty explanation"))
     return ok, issues
 
-def generate_mcq_with_progress(chunks, lang="lv", model="sonar", per_chunk=3, total=30,
-                              max_tokens=900, temperature=0.3):
-    """Generate MCQs from text chunks with progress tracking"""
+WORD_RE = re.compile(r"\w+")
+
+def mcq_shingles(q):
+    """Word bigrams of the question (single words for very short questions)"""
+    words = WORD_RE.findall(str(q.get("question", "")).lower())
+    if len(words) < 3:
+        return set(zip(words))
+    return set(zip(words, words[1:]))
+
+def mcq_answer(q):
+    """The text of the correct choice, lower-cased words only"""
+    choices = q.get("choices")
+    answer = choices.get(q.get("correct"), "") if isinstance(choices, dict) else ""
+    return " ".join(WORD_RE.findall(str(answer).lower()))
+
+def jaccard_ratio(threshold):
+    """``threshold`` as (numerator, denominator), so similarity tests are exact integer comparisons"""
+    t = Fraction(threshold).limit_denominator(1000)
+    return t.numerator, t.denominator
+
+def dedupe_mcqs(mcq_list, threshold=None):
+    """Drop near-duplicate questions, keeping the first of each group.
+    
+    Two questions are duplicates when they have the same correct answer
+    and the Jaccard similarity of their shingles reaches ``threshold``, so
+    template questions with different answers ("capital of France?" and
+    "capital of Germany?") are all kept. Uses prefix filtering: shingles are
+    ordered rarest first and only the first ``len - ceil(threshold * len) + 1``
+    of each question are indexed under its answer; any pair above the
+    threshold must share one. Questions with an answer no other question
+    has are kept without being shingled. Only candidates are compared
+    exactly, so large banks are deduplicated without pairwise comparison
+    and no duplicate is missed.
+    Candidates whose size alone rules out the threshold are skipped. All
+    tests are done in integers (see jaccard_ratio), so the result is the
+    same as a pairwise scan's, boundary included.
+    Returns (kept, dropped_count).
+    """
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    if not threshold:
+        return list(mcq_list), 0
+    num, den = jaccard_ratio(threshold)
+    answers = [mcq_answer(q) if isinstance(q, dict) else None for q in mcq_list]
+    # Only questions sharing their answer with another one can be duplicates
+    shared = {a for a, count in Counter(answers).items() if count > 1 and a is not None}
+    shingled = [mcq_shingles(q) if a in shared else None for q, a in zip(mcq_list, answers)]
+    freq = Counter(s for shingles in shingled if shingles for s in shingles)
+    # Ties in frequency are broken by the shingle itself: the order must be the same for every question
+    rank = {s: r for r, s in enumerate(sorted(freq, key=lambda s: (freq[s], s)))}
+    kept = []
+    kept_shingles = []
+    indexes = {}
+    dropped = 0
+    for q, shingles, answer in zip(mcq_list, shingled, answers):
+        if not shingles:
+            kept.append(q)
+            continue
+        size = len(shingles)
+        prefix = sorted(shingles, key=rank.__getitem__)[:size + (-num * size // den) + 1]
+        index = indexes.setdefault(answer, {})
+        candidates = {j for s in prefix for j in index.get(s, ())}
+        # |a & b| / |a | b| >= t  <=>  |a & b| * (1 + t) >= t * (|a| + |b|)
+        if any(len(shingles & kept_shingles[j]) * (num + den) >= num * (size + len(kept_shingles[j]))
+               for j in candidates if num * size <= den * len(kept_shingles[j])
+               and num * len(kept_shingles[j]) <= den * size):
+            dropped += 1
+            continue
+        for s in prefix:
+            index.setdefault(s, []).append(len(kept_shingles))
+        kept_shingles.append(shingles)
+        kept.append(q)
+    return kept, dropped
+
+def generate_chunk_mcqs(chunk_text, lang="lv", model="sonar", n=3, max_tokens=900, temperature=0.3,
+                        use_cache=True, on_question=None, stream=None, on_retry=None, deadline=None,
+                        avoid=None, compress=None):
+    """Request and parse MCQs for a single chunk; raises ValueError if the reply is not JSON.
+    
+    ``on_question`` is called for every parsed question: as soon as it is
+    received when streaming, otherwise once the full reply has been parsed.
+    A streamed reply is parsed again in full once it ends, and the result
+    with more valid questions is kept.
+    ``on_retry`` and ``deadline`` are passed through to post_pplx; ``avoid``
+    lists questions already written for this chunk. With ``compress``
+    (default COMPRESS_CHUNKS) the prompt gets compress_chunk's extract.
+    """
+    stream = STREAM_COMPLETIONS if stream is None else stream
+    compress = COMPRESS_CHUNKS if compress is None else compress
+    if compress:
+        chunk_text = compress_chunk(chunk_text, n)
+    msgs = build_mcq_prompt(chunk_text, lang=lang, n=n, avoid=avoid)
+    
+    streamed = []
+    if stream:
+        content, meta, streamed = call_pplx_hedged(call_pplx_stream, model, msgs, max_tokens=max_tokens,
+                                                   temperature=temperature, use_cache=use_cache,
+                                                   on_object=on_question, on_retry=on_retry,
+                                                   deadline=deadline)
+    else:
+        content, meta = call_pplx_hedged(call_pplx, model, msgs, max_tokens=max_tokens,
+                                         temperature=temperature, use_cache=use_cache, on_retry=on_retry,
+                                         deadline=deadline)
+    
+    try:
+        parsed = parse_mcq_content(content)
+    except ValueError:
+        if streamed:
+            return streamed
+        # Don't keep serving a reply we cannot use
+        key = llm_cache_key(model, msgs, max_tokens, temperature)
+        llm_cache.delete(key)
+        if DEBUG_RAW_DIR:
+            DEBUG_RAW_DIR.mkdir(parents=True, exist_ok=True)
+            (DEBUG_RAW_DIR / f"{key.split(':')[1][:16]}.txt").write_text(content, encoding="utf-8")
+        raise
+    
+    # The stream parser may have salvaged only part of a reply the full parser reads whole
+    if streamed and (sum(validate_mcq_list([q])[0] for q in streamed)
+                     >= sum(validate_mcq_list([q])[0] for q in parsed)):
+        return streamed
+    if on_question:
+        for q in parsed:
+            if q not in streamed:
+                on_question(q)
+    return parsed
+
+def parse_packed_content(content, count):
+    """Split a packed reply into ``count`` per-section lists (None where a section is missing or malformed).
+    
+    A truncated reply keeps the sections, and the whole questions within
+    them, that arrived before the cut.
+    """
+    try:
+        parsed = parse_llm_json(content)
+    except ValueError:
+        parsed = None
+    if not isinstance(parsed, dict):
+        return [None] * count
+    sections = [parsed.get(f"S{k}") for k in range(1, count + 1)]
+    return [section if isinstance(section, list) else None for section in sections]
+
+def generate_packed_mcqs(sections, lang="lv", model="sonar", max_tokens=900, temperature=0.3,
+                         use_cache=True, on_question=None, on_retry=None, deadline=None, compress=None):
+    """One request for several chunks; ``sections`` is a list of (key, chunk_text, n, avoid).
+    
+    Returns {key: questions}, with None for sections the reply did not
+    answer usably so the caller can retry them alone; a section holding
+    fewer than its ``n`` (such as the one a truncated reply was cut in) is
+    returned as is for the caller to request the rest. ``max_tokens`` is per
+    section. ``on_question(key, question)`` is called once the reply is parsed.
+    """
+    compress = COMPRESS_CHUNKS if compress is None else compress
+    msgs = build_packed_prompt([(compress_chunk(text, n) if compress else text, n, avoid)
+                                for _, text, n, avoid in sections], lang=lang)
+    total_tokens = max_tokens * len(sections)
+    content, meta = call_pplx_hedged(call_pplx, model, msgs, max_tokens=total_tokens,
+                                     temperature=temperature, use_cache=use_cache, on_retry=on_retry,
+                                     deadline=deadline)
+    answers = parse_packed_content(content, len(sections))
+    if any(parsed is None or len(parsed) < n for (_, _, n, _), parsed in zip(sections, answers)):
+        # Don't keep serving a reply with sections we cannot use
+        llm_cache.delete(llm_cache_key(model, msgs, total_tokens, temperature))
+    out = {}
+    for (key, _, _, _), parsed in zip(sections, answers):
+        out[key] = parsed
+        if on_question and parsed:
+            for q in parsed:
+                on_question(key, q)
+    return out
+
+def plan_topup(chunks, asked, deficit, density=None):
+    """Spread ``deficit`` questions over the chunks with the most unused content.
+    
+    A chunk's unused content is its estimated tokens, times its ``density``
+    (see chunk_density; 1 for every chunk if None), divided by one plus the
+    questions already asked of it. The deficit is shared out one question at
+    a time, so dense chunks get more but intros and outros that rank_chunks
+    passed over are not picked just for being untouched. Returns {chunk_index: n}.
+    """
+    weight = [estimate_tokens(c) * (1 if density is None else density[i]) for i, c in enumerate(chunks)]
+    heap = [(-weight[i] / (1 + asked.get(i, 0)), i) for i in range(len(chunks))]
+    heapq.heapify(heap)
+    plan = {}
+    for _ in range(deficit):
+        _, i = heapq.heappop(heap)
+        plan[i] = plan.get(i, 0) + 1
+        heapq.heappush(heap, (-weight[i] / (1 + asked.get(i, 0) + plan[i]), i))
+    return plan
+
+TERM_RE = re.compile(r"[^\W\d_]{3,}")
+
+def chunk_term_weights(chunks):
+    """Per chunk TF-IDF weights {term: weight} (sublinear tf, smoothed idf), term counts and the idf table.
+    
+    Terms that occur in every chunk get idf 0 and are left out, which drops
+    function words without a stop-word list.
+    """
+    counts = [Counter(TERM_RE.findall(c.lower())) for c in chunks]
+    df = Counter(t for c in counts for t in c)
+    idf = {t: math.log((1 + len(chunks)) / (1 + d)) for t, d in df.items()}
+    weights = [{t: (1 + math.log(tf)) * idf[t] for t, tf in c.items() if idf[t] > 0} for c in counts]
+    return weights, counts, idf
+
+def chunk_density(counts, idf):
+    """Per chunk mean idf per word, scaled down by the share of BOILERPLATE_WORDS; the densest chunk is 1"""
+    density = []
+    for c in counts:
+        size = sum(c.values()) or 1
+        boilerplate = sum(c[t] for t in BOILERPLATE_WORDS.intersection(c)) / size
+        density.append(sum(tf * idf[t] for t, tf in c.items()) / size * max(0.0, 1 - 5 * boilerplate))
+    top = max(density, default=0) or 1
+    return [d / top for d in density]
+
+def rank_chunks(chunks, diversity=None):
+    """Chunk indices, most worth asking about first.
+    
+    Chunks are picked greedily by maximal marginal relevance: chunk_density
+    minus ``diversity`` times the cosine similarity to the closest chunk
+    already picked, so a small quota is spread over different parts of the
+    video.
+    """
+    diversity = CHUNK_DIVERSITY if diversity is None else diversity
+    weights, counts, idf = chunk_term_weights(chunks)
+    density = chunk_density(counts, idf)
+    norms = [math.sqrt(sum(v * v for v in w.values())) or 1 for w in weights]
+    
+    def similarity(a, b):
+        small, large = sorted((weights[a], weights[b]), key=len)
+        return sum(v * large.get(t, 0) for t, v in small.items()) / (norms[a] * norms[b])
+    
+    order = []
+    closest = [0.0] * len(chunks)
+    remaining = list(range(len(chunks)))
+    while remaining:
+        i = max(remaining, key=lambda j: (1 - diversity) * density[j] - diversity * closest[j])
+        order.append(i)
+        remaining.remove(i)
+        for j in remaining:
+            closest[j] = max(closest[j], similarity(i, j))
+    return order
+
+SENTENCE_MAX_WORDS = 60                     # longer runs (unpunctuated captions) are cut into windows
+SENTENCE_WINDOW_WORDS = 30
+CAPITALIZED_RE = re.compile(r"(?<=\w\s)[A-ZĀČĒĢĪĶĻŅŠŪŽÄÖÜА-Я]\w+")
+
+def split_sentences(text):
+    """Sentences of a chunk; unpunctuated runs become SENTENCE_WINDOW_WORDS-word windows"""
     out = []
+    for para in re.split(r"\n\s*\n", text):
+        start = 0
+        bounds = [m.end() for m in SENTENCE_END_RE.finditer(para)] + [len(para)]
+        for end in bounds:
+            words = para[start:end].split()
+            start = end
+            if len(words) > SENTENCE_MAX_WORDS:
+                out.extend(" ".join(words[k:k + SENTENCE_WINDOW_WORDS])
+                           for k in range(0, len(words), SENTENCE_WINDOW_WORDS))
+            elif words:
+                out.append(" ".join(words))
+    return out
+
+def textrank(weights, damping=0.85, iterations=30):
+    """PageRank over the cosine-similarity graph of sparse term-weight vectors"""
+    n = len(weights)
+    norms = [math.sqrt(sum(v * v for v in w.values())) or 1 for w in weights]
+    edges = [[] for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            small, large = sorted((weights[i], weights[j]), key=len)
+            sim = sum(v * large.get(t, 0) for t, v in small.items()) / (norms[i] * norms[j])
+            if sim > 0:
+                edges[i].append((j, sim))
+                edges[j].append((i, sim))
+    out_weight = [sum(sim for _, sim in e) or 1 for e in edges]
+    rank = [1 / n] * n
+    for _ in range(iterations):
+        rank = [(1 - damping) / n + damping * sum(rank[j] * sim / out_weight[j] for j, sim in edges[i])
+                for i in range(n)]
+    return rank
+
+def compress_chunk(chunk_text, n):
+    """Cut a chunk to about ``n * COMPRESS_TOKENS_PER_QUESTION`` tokens, keeping its best sentences.
     
-    emit_progress("generate_mcqs", "processing", f"Starting MCQ generation for {len(chunks)} chunks")
+    Sentences are ranked with TextRank and boosted when they carry facts
+    (numbers, mid-sentence capitalised names); the top ones within the
+    budget, repeats skipped, are returned in their original order. Chunks already within
+    the budget are returned unchanged.
+    """
+    budget = max(COMPRESS_MIN_TOKENS, n * COMPRESS_TOKENS_PER_QUESTION)
+    if estimate_tokens(chunk_text) <= budget:
+        return chunk_text
+    sentences = split_sentences(chunk_text)
+    weights, _, _ = chunk_term_weights(sentences)
+    rank = textrank(weights)
+    scores = [r * (1 + 0.5 * any(c.isdigit() for c in s) + 0.25 * bool(CAPITALIZED_RE.search(s)))
+              for r, s in zip(rank, sentences)]
+    keep, seen, used = set(), set(), 0
+    for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        cost = estimate_tokens(sentences[i])
+        if used + cost <= budget and sentences[i].lower() not in seen:
+            keep.add(i)
+            seen.add(sentences[i].lower())
+            used += cost
+    return " ".join(s for i, s in enumerate(sentences) if i in keep)
+
+class MCQScheduler:
+    """One job's chunk calls on a thread pool, with the questions they return gathered per chunk.
     
-    for i, ch in enumerate(chunks):
-        need = total - len(out)
-        if need <= 0:
-            break
-        ask = min(per_chunk, need)
-        
-        emit_progress("generate_mcqs", "processing", 
-                     f"Processing chunk {i+1}/{len(chunks)} - requesting {ask} questions")
-        
-        try:
-            msgs = build_mcq_prompt(ch, lang=lang, n=ask)
-            content, meta = call_pplx(model, msgs, max_tokens=max_tokens, temperature=temperature)
+    Chunks are requested in ``order`` while the questions collected plus
+    those still being requested fall short of ``total``; see
+    generate_mcq_with_progress for the rest.
+    """
+    
+    def __init__(self, chunks, order, lang, model, per_chunk, total, max_tokens, temperature,
+                 max_workers, use_cache, deadline, pack_sections):
+        self.chunks = chunks
+        self.order = order
+        self.lang = lang
+        self.model = model
+        self.per_chunk = per_chunk
+        self.total = total
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.deadline = deadline
+        self.pack_sections = pack_sections
+        self.results = {}      # chunk index -> questions collected
+        self.received = {}     # chunk index -> questions streamed so far, finished or not
+        self.asked = {}        # chunk index -> questions requested in total
+        self.stored = {}       # chunk index -> questions question_cache held at the start
+        self.reused = {}       # chunk index -> stored questions served
+        self.generated = {}    # chunk index -> new valid questions
+        self.retries = {}
+        self.in_flight = {}    # future -> its (i, ask, avoid) entries
+        self.collected = 0
+        self.requested = 0
+        self.next_chunk = 0
+        self.duplicates = 0
+        self.expired = False
+        self._streamed = 0
+        self._stream_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+    
+    def stream_question(self, chunk_index, question):
+        # Runs on worker threads; streams no more than the quota, the final
+        # list is re-sorted by chunk
+        self.received.setdefault(chunk_index, []).append(question)
+        if not validate_mcq_list([question])[0]:
+            return
+        with self._stream_lock:
+            if self._streamed >= self.total:
+                return
+            self._streamed += 1
+        emit_questions(chunk_index, [question])
+    
+    @staticmethod
+    def retry_key(entries):
+        # Retries are counted per call: by chunk index, or by the tuple of a pack's chunk indices
+        return entries[0][0] if len(entries) == 1 else tuple(e[0] for e in entries)
+    
+    def report_retry(self, key, attempt, delay, reason):
+        self.retries[key] = attempt
+        if isinstance(key, tuple):
+            label, extra = f"Chunks {', '.join(str(j + 1) for j in key)}", {'chunks': [j + 1 for j in key]}
+        else:
+            label, extra = f"Chunk {key+1}", {'chunk': key + 1}
+        emit_progress("generate_mcqs", "processing",
+                     f"{label}: {reason}, retry {attempt}/{MAX_RETRIES} in {delay:.1f}s",
+                     {**extra, 'retries': attempt})
+    
+    def submit(self, i, ask, avoid=None):
+        """Serve what question_cache holds for the chunk first; the (i, ask, avoid) request still needed, or None"""
+        self.asked[i] = self.asked.get(i, 0) + ask
+        if self.use_cache and i not in self.stored:
+            self.stored[i] = load_chunk_questions(self.chunks[i], self.lang, self.model)
+        hits = self.stored.get(i, [])[len(self.reused.get(i, [])):][:ask]
+        if hits:
+            self.reused.setdefault(i, []).extend(hits)
+            self.results.setdefault(i, []).extend(hits)
+            self.collected += len(hits)
+            for q in hits:
+                self.stream_question(i, q)
+            emit_progress("generate_mcqs", "success", f"Reused {len(hits)} cached questions for chunk {i+1}",
+                         {'chunk': i + 1, 'cached': len(hits), 'collected': self.collected, 'total': self.total})
+            ask -= len(hits)
+        if not ask:
+            return None
+        if self.stored.get(i):
+            avoid = list(dict.fromkeys((avoid or []) + [q.get('question', '') for q in self.stored[i]]))
+        return (i, ask, avoid)
+    
+    def launch(self, entries):
+        """One call for these (i, ask, avoid) requests: a plain chunk call or a packed one"""
+        i, ask, avoid = entries[0]
+        run = contextvars.copy_context().run
+        if len(entries) == 1:
+            fut = self._pool.submit(run, generate_chunk_mcqs, self.chunks[i], lang=self.lang, model=self.model,
+                                    n=ask, max_tokens=self.max_tokens, temperature=self.temperature,
+                                    use_cache=self.use_cache, on_question=partial(self.stream_question, i),
+                                    on_retry=partial(self.report_retry, i), deadline=self.deadline, avoid=avoid)
+        else:
+            emit_progress("generate_mcqs", "processing",
+                         f"Packing chunks {', '.join(str(e[0] + 1) for e in entries)} into one request")
+            fut = self._pool.submit(run, generate_packed_mcqs,
+                                    [(j, self.chunks[j], n, av) for j, n, av in entries],
+                                    lang=self.lang, model=self.model, max_tokens=self.max_tokens,
+                                    temperature=self.temperature, use_cache=self.use_cache,
+                                    on_question=self.stream_question,
+                                    on_retry=partial(self.report_retry, self.retry_key(entries)),
+                                    deadline=self.deadline)
+        self.in_flight[fut] = entries
+        self.requested += sum(e[1] for e in entries)
+    
+    def launch_packed(self, entries):
+        """Launch requests grouped into packs within PACK_MAX_SECTIONS and PACK_MAX_TOKENS"""
+        group, tokens = [], 0
+        for entry in entries:
+            size = estimate_tokens(self.chunks[entry[0]])
+            if group and (len(group) >= self.pack_sections or tokens + size > PACK_MAX_TOKENS):
+                self.launch(group)
+                group, tokens = [], 0
+            group.append(entry)
+            tokens += size
+        if group:
+            self.launch(group)
+    
+    def fill(self):
+        """Request the next chunks in rank order while the quota and the worker pool allow"""
+        group, tokens = [], 0
+        while self.next_chunk < len(self.chunks) and len(self.in_flight) < self.max_workers:
+            need = self.total - self.collected - self.requested - sum(e[1] for e in group)
+            if need <= 0:
+                break
+            i = self.order[self.next_chunk]
+            size = estimate_tokens(self.chunks[i])
+            if group and (len(group) >= self.pack_sections or tokens + size > PACK_MAX_TOKENS):
+                self.launch(group)
+                group, tokens = [], 0
+                continue
+            ask = min(self.per_chunk, need)
+            self.next_chunk += 1
             
-            parsed = None
+            emit_progress("generate_mcqs", "processing", 
+                         f"Processing chunk {i+1}/{len(self.chunks)} - requesting {ask} questions")
+            entry = self.submit(i, ask)
+            if entry:
+                group.append(entry)
+                tokens += size
+        if group:
+            self.launch(group)
+    
+    def collect(self):
+        """Wait for at least one call to finish and take its questions; False once the deadline has passed"""
+        left = time_left(self.deadline)
+        done, _ = wait(self.in_flight, timeout=None if left is None else max(0, left),
+                       return_when=FIRST_COMPLETED)
+        if not done:
+            return False
+        ok = True
+        for fut in done:
+            entries = self.in_flight.pop(fut)
+            self.requested -= sum(e[1] for e in entries)
+            i = entries[0][0]
+            key = self.retry_key(entries)
             try:
-                parsed = json.loads(content.strip())
-            except Exception:
-                try:
-                    parsed = parse_json_repair(content)
-                except Exception:
+                answers = fut.result()
+            except DeadlineExceeded:
+                # One call giving up (a rate-limit wait or Retry-After it could not
+                # sit out) only loses its chunks; the job expires with the budget
+                for j, _, _ in entries:
+                    if self.received.get(j):
+                        self.collected += len(self.received[j]) - len(self.results.get(j, []))
+                        self.results[j] = list(self.received[j])
+                left = time_left(self.deadline)
+                if left is not None and left <= 0:
+                    ok = False
+                else:
+                    emit_progress("generate_mcqs", "error",
+                                 f"Chunk {i+1} could not finish within the time budget - skipping it",
+                                 {'chunk': i + 1, 'retries': self.retries.get(key, 0)})
+                continue
+            except Exception as e:
+                if len(entries) > 1:
+                    emit_progress("generate_mcqs", "error",
+                                 f"Packed request failed ({e}) - requesting its chunks one by one")
+                    for entry in entries:
+                        self.launch([entry])
+                elif isinstance(e, ValueError):
                     emit_progress("generate_mcqs", "error", 
                                  f"Failed to parse JSON for chunk {i+1}")
-                    continue
+                else:
+                    emit_progress("generate_mcqs", "error", 
+                                 f"Error processing chunk {i+1}: {str(e)}",
+                                 {'chunk': i + 1, 'retries': self.retries.get(key, 0)})
+                continue
             
-            if isinstance(parsed, dict):
-                parsed = [parsed]
-            if isinstance(parsed, list):
-                out.extend(parsed)
+            if len(entries) == 1:
+                answers = {i: answers}
+            for j, ask, avoid in entries:
+                parsed = answers.get(j)
+                if parsed is None:
+                    emit_progress("generate_mcqs", "error",
+                                 f"Packed reply had no usable section for chunk {j+1} - requesting it alone")
+                    self.launch([(j, ask, avoid)])
+                    continue
+                self.results.setdefault(j, []).extend(parsed)
+                self.generated.setdefault(j, []).extend(q for q in parsed if validate_mcq_list([q])[0])
+                self.collected += len(parsed)
                 emit_progress("generate_mcqs", "success", 
-                             f"Generated {len(parsed)} questions from chunk {i+1}")
-                
-        except Exception as e:
-            emit_progress("generate_mcqs", "error", 
-                         f"Error processing chunk {i+1}: {str(e)}")
-            continue
+                             f"Generated {len(parsed)} questions from chunk {j+1}",
+                             {'chunk': j + 1, 'collected': self.collected, 'total': self.total,
+                              'retries': self.retries.get(key, 0)})
+                if len(entries) > 1 and len(parsed) < ask:
+                    # A short section (usually where a truncated reply was cut) gets the rest alone
+                    emit_progress("generate_mcqs", "error",
+                                 f"Packed reply gave chunk {j+1} only {len(parsed)} of {ask} questions - "
+                                 f"requesting the rest alone")
+                    self.launch([(j, ask - len(parsed), list(dict.fromkeys(
+                        (avoid or []) + [q.get('question', '') for q in parsed if isinstance(q, dict)])))])
+        return ok
+    
+    def run(self):
+        """First pass: fill and collect until the quota is met, the chunks run out or the deadline passes"""
+        while not self.expired:
+            self.fill()
+            if not self.in_flight:
+                break
+            self.expired = not self.collect()
+    
+    def unique_questions(self):
+        """Dedupe everything gathered so far in chunk order; collected becomes the unique count"""
+        kept, self.duplicates = dedupe_mcqs([q for i in sorted(self.results) for q in self.results[i]])
+        self.collected = len(kept)
+        return kept
+    
+    def top_up(self, rounds):
+        """Ask for the shortfall in up to ``rounds`` rounds; returns (rounds run, questions gained)"""
+        self.unique_questions()
+        density = None
+        done = gained = 0
+        while not self.expired and self.chunks and self.collected < self.total and done < rounds:
+            if density is None and CHUNK_SELECTION and len(self.chunks) > 1:
+                # Top-ups follow the ranking too, not just chunk length
+                density = chunk_density(*chunk_term_weights(self.chunks)[1:])
+            done += 1
+            before = self.collected
+            plan = plan_topup(self.chunks, self.asked, self.total - self.collected, density)
+            emit_progress("generate_mcqs", "processing",
+                         f"Top-up round {done}/{rounds}: requesting {self.total - self.collected} more "
+                         f"questions from {len(plan)} chunks", {'round': done})
+            self.launch_packed([entry for entry in (
+                self.submit(i, ask, avoid=[q.get('question', '') for q in self.results.get(i, [])
+                                           if isinstance(q, dict)])
+                for i, ask in sorted(plan.items())) if entry])
+            while self.in_flight and not self.expired:
+                self.expired = not self.collect()
+            self.unique_questions()
+            gained += max(0, self.collected - before)
+        return done, gained
+    
+    def close(self):
+        # On expiry don't wait for stragglers; their timeouts are already cut to the deadline
+        self._pool.shutdown(wait=not self.expired, cancel_futures=True)
+    
+    def finish(self):
+        """The job's questions: unfinished chunks' streamed ones on expiry, deduped, cut to total, stored"""
+        if self.expired:
+            abandoned = [e[0] for entries in self.in_flight.values() for e in entries]
+            for i in abandoned:
+                if self.received.get(i):
+                    self.results[i] = list(self.received[i])
+            emit_progress("generate_mcqs", "error",
+                         f"Time budget exhausted - returning {sum(map(len, self.results.values()))} questions "
+                         f"gathered so far", {'abandoned_chunks': len(abandoned)})
+        out = self.unique_questions()[:self.total]
+        # Only questions the job returns are stored: not duplicates, not the surplus over total
+        kept_ids = {id(q) for q in out}
+        for i, fresh in self.generated.items():
+            fresh = [q for q in fresh if id(q) in kept_ids]
+            if fresh:
+                save_chunk_questions(self.chunks[i], self.lang, self.model, self.stored.get(i, []) + fresh)
+        return out
+
+def generate_mcq_with_progress(chunks, lang="lv", model="sonar", per_chunk=3, total=30,
+                              max_tokens=900, temperature=0.3, max_workers=None, use_cache=True,
+                              deadline=None, topup_rounds=None, pack=None):
+    """Generate up to ``total`` MCQs from text chunks with progress tracking.
     
-    out = out[:total]
+    Chunks run on MCQScheduler in rank_chunks order; near-duplicates are
+    dropped and up to ``topup_rounds`` rounds re-request the shortfall. Past
+    the ``deadline`` (time.monotonic()) the questions gathered so far are
+    returned. Returns (mcqs, ok, issues, info); ``info`` is merged into
+    generation_info.
+    """
+    max_workers = max_workers or MAX_CONCURRENCY
+    topup_rounds = TOPUP_ROUNDS if topup_rounds is None else topup_rounds
+    pack_sections = PACK_MAX_SECTIONS if (PACK_CHUNKS if pack is None else pack) else 1
+    order = list(range(len(chunks)))
+    if CHUNK_SELECTION and len(chunks) > 1:
+        order = rank_chunks(chunks)
+        used = min(len(chunks), -(-total // max(1, per_chunk)))
+        emit_progress("generate_mcqs", "processing",
+                     f"Ranked {len(chunks)} chunks by information density - "
+                     f"starting with chunks {', '.join(str(i + 1) for i in sorted(order[:used]))}",
+                     {'order': [i + 1 for i in order]})
+    
+    emit_progress("generate_mcqs", "processing",
+                 f"Starting MCQ generation for {len(chunks)} chunks ({max_workers} parallel requests)")
+    
+    scheduler = MCQScheduler(chunks, order, lang, model, per_chunk, total, max_tokens, temperature,
+                             max_workers, use_cache, deadline, pack_sections)
+    try:
+        scheduler.run()
+        rounds, topup_collected = scheduler.top_up(topup_rounds)
+    finally:
+        scheduler.close()
+    
+    out = scheduler.finish()
+    reused_ids = {id(q) for qs in scheduler.reused.values() for q in qs}
+    cached_questions = sum(id(q) in reused_ids for q in out)
+    duplicates = scheduler.duplicates
+    if duplicates:
+        emit_progress("generate_mcqs", "processing", f"Removed {duplicates} near-duplicate questions",
+                     {'duplicates': duplicates})
     ok, issues = validate_mcq_list(out)
     
     if ok:
@@ -357,7 +2085,169 @@ def generate_mcq_with_progress(chunks, lang="lv", model="sonar", per_chunk=3, to
     else:
         emit_progress("validate", "error", f"Validation issues found: {len(issues)} problems")
     
-    return out, ok, issues
+    info = {'partial': scheduler.expired, 'retries': sum(scheduler.retries.values()),
+            'topup_rounds': rounds, 'topup_questions': topup_collected, 'duplicates_removed': duplicates,
+            'cached_questions': cached_questions}
+    return out, ok, issues, info
+
+class Job:
+    """A queued /process request and, once finished, its result or error"""
+    
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "queued"  # 'queued', 'running', 'done', 'failed'
+        self.result = None
+        self.error = None
+        self.http_status = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.events = EventChannel()
+    
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'created': datetime.fromtimestamp(self.created).isoformat(),
+            'started': self.started and datetime.fromtimestamp(self.started).isoformat(),
+            'finished': self.finished and datetime.fromtimestamp(self.finished).isoformat()
+        }
+
+jobs = {}
+jobs_lock = threading.Lock()
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="mcq-job")
+
+def submit_job(job):
+    """Register and queue a Job; expired finished jobs are dropped"""
+    now = time.time()
+    with jobs_lock:
+        for job_id in [j.id for j in jobs.values() if j.finished and now - j.finished > JOB_TTL]:
+            del jobs[job_id]
+        jobs[job.id] = job
+    job_executor.submit(run_job, job)
+    return job
+
+def get_job(job_id):
+    with jobs_lock:
+        return jobs.get(job_id)
+
+def run_job(job):
+    """Worker entry point: run the pipeline and record the outcome on the job"""
+    token = current_job.set(job)
+    job.status = "running"
+    job.started = time.time()
+    try:
+        job.result = run_pipeline(**job.params)
+        result_id = store_result(job.result['mcqs'])
+        job.result['result_id'] = result_id
+        job.result['download_urls'] = {fmt: f'/download/{fmt}/{result_id}' for fmt in EXPORTERS}
+        job.http_status = 200
+        job.status = "done"
+    except ValueError as e:
+        job.error = str(e)
+        job.http_status = 400
+        job.status = "failed"
+    except Exception as e:
+        emit_progress("error", "error", f"Unexpected error: {str(e)}")
+        job.error = str(e)
+        job.http_status = 500
+        job.status = "failed"
+    finally:
+        job.finished = time.time()
+        job.events.close()
+        current_job.reset(token)
+
+def run_pipeline(url, lang="en", num_questions=20, fresh=False, time_budget=None):
+    """Transcript -> text -> chunks -> MCQs; raises ValueError for unusable input.
+    
+    ``time_budget`` (seconds, default JOB_TIME_BUDGET) bounds the whole job;
+    when it runs out the questions gathered so far are returned with
+    generation_info['partial'] set.
+    """
+    time_budget = JOB_TIME_BUDGET if time_budget is None else time_budget
+    deadline = time.monotonic() + time_budget if time_budget else None
+    # Step 3: Get transcript
+    emit_progress("transcript", "processing", "Fetching video transcript")
+    segments, transcript_lang, source = get_transcript(url, preferred_langs=(lang, "en"))
+    
+    if segments is None:
+        emit_progress("transcript", "error", f"Could not get transcript: {source}")
+        raise ValueError(f'Could not get transcript: {source}')
+    
+    emit_progress("transcript", "success", f"Transcript fetched successfully", {
+        'language': transcript_lang,
+        'source': source,
+        'segments': len(segments)
+    })
+    
+    # Step 4: Convert to plain text
+    emit_progress("convert_text", "processing", "Converting transcript to plain text")
+    plain_text = segments_to_plain_text(segments)
+    raw_tokens = text_tokens = estimate_tokens(plain_text)
+    if NORMALIZE_TRANSCRIPT:
+        plain_text = segments_to_plain_text(normalize_segments(segments, lang=transcript_lang))
+        text_tokens = estimate_tokens(plain_text)
+        emit_progress("convert_text", "processing",
+                      f"Transcript normalized - {raw_tokens - text_tokens:,} of {raw_tokens:,} tokens removed",
+                      {'raw_tokens': raw_tokens, 'tokens': text_tokens})
+    
+    if len(plain_text) < 500:
+        emit_progress("convert_text", "error", "Transcript too short to generate meaningful questions")
+        raise ValueError('Transcript too short to generate meaningful questions')
+    
+    emit_progress("convert_text", "success", f"Text converted successfully ({len(plain_text):,} characters)")
+    
+    # Step 5: Split into chunks
+    emit_progress("split_chunks", "processing", "Splitting text into processing chunks")
+    # The chunk layout depends only on the transcript, so a later job asking for a
+    # different number of questions hits the same question_cache entries
+    target_chunks = TARGET_CHUNKS
+    per_chunk = max(1, (num_questions + target_chunks - 1) // target_chunks)
+    
+    chunks, tokens_per_chunk = split_into_target_chunks(plain_text, target_chunks)
+    emit_progress("split_chunks", "success", f"Text split into {len(chunks)} chunks",
+                  {'tokens': text_tokens, 'tokens_per_chunk': tokens_per_chunk})
+    
+    # Step 6: Generate MCQs
+    mcq_list, ok, issues, info = generate_mcq_with_progress(
+        chunks, 
+        lang=lang, 
+        model=MODEL,
+        per_chunk=per_chunk, 
+        total=num_questions,
+        max_tokens=MAX_TOKENS, 
+        temperature=TEMPERATURE,
+        use_cache=not fresh,
+        deadline=deadline
+    )
+    
+    # Step 7: Final completion
+    emit_progress("complete", "success", f"Process completed successfully - {len(mcq_list)} questions generated")
+    
+    return {
+        'success': True,
+        'mcqs': mcq_list,
+        'transcript_info': {
+            'language': transcript_lang,
+            'source': source,
+            'length': len(segments),
+            'text_length': len(plain_text),
+            'raw_tokens': raw_tokens,
+            'tokens': text_tokens,
+            'tokens_saved': raw_tokens - text_tokens
+        },
+        'generation_info': {
+            'chunks_used': len(chunks),
+            'questions_generated': len(mcq_list),
+            'validation_ok': ok,
+            'issues': issues[:5],
+            'llm_cache': llm_cache.stats(),
+            'time_budget': time_budget,
+            **info
+        }
+    }
 
 @app.route('/')
 def index():
@@ -365,164 +2255,361 @@ def index():
     return render_template('index.html')
 
 
-@app.route('/progress')
-def progress():
-    """Server-sent events endpoint for progress updates"""
-    def generate():
-        global progress_updates
-        sent_count = 0
-        
-        while True:
-            if sent_count < len(progress_updates):
-                for update in progress_updates[sent_count:]:
-                    yield f"data: {json.dumps(update)}\n\n"
-                sent_count = len(progress_updates)
-            time.sleep(0.1)  # Check for updates every 100ms
-            
-    return Response(generate(), mimetype='text/event-stream',
-                   headers={'Cache-Control': 'no-cache'})
-
 @app.route('/process', methods=['POST'])
 def process_video():
-    """Process YouTube video and generate MCQs with progress tracking"""
-    global progress_updates
-    progress_updates = []  # Reset progress
-    
+    """Queue a YouTube video for MCQ generation and return the job id right away"""
     try:
         data = request.json
         url = data.get('url', '').strip()
         lang = data.get('language', 'en')
-        num_questions = int(data.get('num_questions', 20))
-        
-        # Step 1: Initialize
-        emit_progress("initialize", "success", "Initializing request", {
-            'url': url,
-            'questions': num_questions,
-            'language': lang
-        })
-        
-        if not url:
-            emit_progress("initialize", "error", "YouTube URL is required")
-            return jsonify({'error': 'YouTube URL is required'}), 400
-        
-        # Step 2: Extract video ID
-        emit_progress("extract_id", "processing", "Extracting video ID from URL")
+        fresh = bool(data.get('fresh', False))
         try:
-            video_id = extract_video_id(url)
-            emit_progress("extract_id", "success", f"Video ID extracted: {video_id}")
-        except Exception as e:
-            emit_progress("extract_id", "error", f"Invalid YouTube URL: {str(e)}")
-            return jsonify({'error': f'Invalid YouTube URL: {str(e)}'}), 400
-        
-        # Step 3: Get transcript
-        emit_progress("transcript", "processing", "Fetching video transcript")
-        segments, transcript_lang, source = get_transcript(url, preferred_langs=(lang, "en"))
-        
-        if segments is None:
-            emit_progress("transcript", "error", f"Could not get transcript: {source}")
-            return jsonify({'error': f'Could not get transcript: {source}'}), 400
-        
-        emit_progress("transcript", "success", f"Transcript fetched successfully", {
-            'language': transcript_lang,
-            'source': source,
-            'segments': len(segments)
-        })
-        
-        # Step 4: Convert to plain text
-        emit_progress("convert_text", "processing", "Converting transcript to plain text")
-        plain_text = segments_to_plain_text(segments)
-        
-        if len(plain_text) < 500:
-            emit_progress("convert_text", "error", "Transcript too short to generate meaningful questions")
-            return jsonify({'error': 'Transcript too short to generate meaningful questions'}), 400
-        
-        emit_progress("convert_text", "success", f"Text converted successfully ({len(plain_text):,} characters)")
-        
-        # Step 5: Split into chunks
-        emit_progress("split_chunks", "processing", "Splitting text into processing chunks")
-        target_chunks = min(12, max(8, num_questions // 3))
-        max_chars_per_chunk = max(1000, len(plain_text) // target_chunks)
-        per_chunk = max(1, (num_questions + target_chunks - 1) // target_chunks)
-        
-        chunks = split_into_chunks(plain_text, max_chars=max_chars_per_chunk)
-        emit_progress("split_chunks", "success", f"Text split into {len(chunks)} chunks")
-        
-        # Step 6: Generate MCQs
-        mcq_list, ok, issues = generate_mcq_with_progress(
-            chunks, 
-            lang=lang, 
-            model=MODEL,
-            per_chunk=per_chunk, 
-            total=num_questions,
-            max_tokens=MAX_TOKENS, 
-            temperature=TEMPERATURE
-        )
+            num_questions = int(data.get('num_questions', 20))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'num_questions must be a whole number'}), 400
+        if not 1 <= num_questions <= MAX_QUESTIONS:
+            return jsonify({'error': f'num_questions must be between 1 and {MAX_QUESTIONS}'}), 400
+        try:
+            time_budget = float(data['time_budget']) if data.get('time_budget') is not None else None
+        except (TypeError, ValueError):
+            time_budget = -1
+        if time_budget is not None and not 0 < time_budget < math.inf:
+            return jsonify({'error': 'time_budget must be a positive number of seconds'}), 400
         
-        # Step 7: Final completion
-        emit_progress("complete", "success", f"Process completed successfully - {len(mcq_list)} questions generated")
+        job = Job({'url': url, 'lang': lang, 'num_questions': num_questions, 'fresh': fresh,
+                   'time_budget': time_budget})
+        token = current_job.set(job)
+        try:
+            # Step 1: Initialize
+            emit_progress("initialize", "success", "Initializing request", {
+                'url': url,
+                'questions': num_questions,
+                'language': lang,
+                'fresh': fresh,
+                'time_budget': time_budget
+            })
+            
+            if not url:
+                return jsonify({'error': 'YouTube URL is required'}), 400
+            
+            # Step 2: Extract video ID
+            emit_progress("extract_id", "processing", "Extracting video ID from URL")
+            try:
+                video_id = extract_video_id(url)
+                emit_progress("extract_id", "success", f"Video ID extracted: {video_id}")
+            except Exception as e:
+                return jsonify({'error': f'Invalid YouTube URL: {str(e)}'}), 400
+        finally:
+            current_job.reset(token)
         
+        submit_job(job)
         return jsonify({
-            'success': True,
-            'mcqs': mcq_list,
-            'transcript_info': {
-                'language': transcript_lang,
-                'source': source,
-                'length': len(segments),
-                'text_length': len(plain_text)
-            },
-            'generation_info': {
-                'chunks_used': len(chunks),
-                'questions_generated': len(mcq_list),
-                'validation_ok': ok,
-                'issues': issues[:5]
-            }
-        })
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/jobs/{job.id}',
+            'result_url': f'/jobs/{job.id}/result',
+            'progress_url': f'/jobs/{job.id}/progress'
+        }), 202
         
     except Exception as e:
-        emit_progress("error", "error", f"Unexpected error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs/<job_id>/progress')
+def job_progress(job_id):
+    """Server-sent events stream of a job's progress, closed when the job finishes.
+    
+    Progress updates are plain messages; validated questions arrive as
+    'mcqs' events (tagged with their chunk) as soon as they are parsed. Every event carries an
+    id, so a reconnecting EventSource resumes from its Last-Event-ID instead
+    of replaying the whole log.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id'}), 404
+    
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        last_id = 0
+    
+    def generate():
+        after = last_id
+        while True:
+            events, closed = job.events.read(after, timeout=SSE_HEARTBEAT)
+            for event_id, name, update in events:
+                kind = f"event: {name}\n" if name else ""
+                yield f"id: {event_id}\n{kind}data: {json.dumps(update)}\n\n"
+                after = event_id
+            if closed:
+                yield f"event: end\ndata: {json.dumps({'status': job.status})}\n\n"
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream',
+                   headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status of a queued/running/finished job"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Result of a finished job (202 with the status while it is still running)"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id'}), 404
+    if job.status == "done":
+        return jsonify(job.result)
+    if job.status == "failed":
+        return jsonify({'error': job.error}), job.http_status
+    return jsonify(job.to_dict()), 202
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Entry counts, sizes and hit/miss counters of the on-disk caches"""
+    return jsonify({
+        'transcripts': transcript_cache.stats(),
+        'llm': llm_cache.stats(),
+        'questions': question_cache.stats(),
+        'results': result_store.stats(),
+        'latency': latency_tracker.stats()
+    })
+
+Exporter = namedtuple("Exporter", ["write", "mimetype", "extension"])
+EXPORTERS = {}
+EXPORT_FLUSH_BYTES = 64 * 1024              # streamed downloads are sent in pieces of about this size
+
+def register_exporter(name, mimetype, extension=None):
+    """Decorator adding a writer to EXPORTERS; a writer takes an MCQ list and yields str (or bytes) pieces"""
+    def register(write):
+        EXPORTERS[name] = Exporter(write, mimetype, extension or name)
+        return write
+    return register
+
+def iter_export(format, mcqs):
+    """Encoded output of an exporter, first piece at once and then in EXPORT_FLUSH_BYTES batches"""
+    buf, size, first = [], 0, True
+    for piece in EXPORTERS[format].write(mcqs):
+        if isinstance(piece, str):
+            piece = piece.encode("utf-8")
+        if not piece:
+            continue
+        buf.append(piece)
+        size += len(piece)
+        if first or size >= EXPORT_FLUSH_BYTES:
+            yield b"".join(buf)
+            buf, size, first = [], 0, False
+    if buf:
+        yield b"".join(buf)
+
+def exportable_mcqs(mcqs):
+    """``mcqs`` in the shape the exporters index: items that are not dicts or lack a
+    question or choices are dropped, the remaining fields are coerced to str"""
+    out = []
+    for q in mcqs:
+        if not isinstance(q, dict) or not isinstance(q.get('choices'), dict):
+            continue
+        choices = {str(k): str(v) for k, v in q['choices'].items() if v is not None}
+        question = str(q.get('question') or '').strip()
+        if not question or not choices:
+            continue
+        correct = str(q.get('correct') or '').strip()
+        if correct not in choices and correct.upper() in choices:
+            correct = correct.upper()
+        out.append({**q, 'question': question, 'choices': choices,
+                    'correct': correct, 'explanation': str(q.get('explanation') or '')})
+    return out
+
+def gradable_mcqs(mcqs):
+    """The items a quiz can grade: those whose correct answer is one of their choices"""
+    return (mcq for mcq in mcqs if mcq['correct'] in mcq['choices'])
+
+def export_response(format, mcqs, filename):
+    """Chunked attachment response streaming ``mcqs`` in ``format``.
+    
+    The list goes through exportable_mcqs first: once streaming has begun
+    the status is sent, so a malformed item must not fail mid-download.
+    """
+    exp = EXPORTERS[format]
+    return Response(iter_export(format, exportable_mcqs(mcqs)), mimetype=exp.mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}.{exp.extension}"'})
+
+@register_exporter('json', 'application/json')
+def export_json(mcqs):
+    if not mcqs:
+        yield "[]"
+        return
+    for i, mcq in enumerate(mcqs):
+        yield "[\n" if i == 0 else ",\n"
+        yield textwrap.indent(json.dumps(mcq, ensure_ascii=False, indent=2), "  ")
+    yield "\n]"
+
+@register_exporter('txt', 'text/plain')
+def export_txt(mcqs):
+    for i, mcq in enumerate(mcqs, 1):
+        lines = [f"Question {i}: {mcq['question']}\n\n"]
+        for choice, text in mcq['choices'].items():
+            marker = "✓ " if choice == mcq['correct'] else "  "
+            lines.append(f"{marker}{choice}) {text}\n")
+        lines.append(f"\nExplanation: {mcq['explanation']}\n")
+        lines.append("-" * 80 + "\n\n")
+        yield "".join(lines)
+
+@register_exporter('csv', 'text/csv')
+def export_csv(mcqs):
+    line = io.StringIO()
+    writer = csv.writer(line)
+    
+    def row(values):
+        line.seek(0)
+        line.truncate()
+        writer.writerow(values)
+        return line.getvalue()
+    
+    yield "\ufeff" + row(["question", "A", "B", "C", "D", "correct", "explanation"])  # BOM for Excel
+    for mcq in mcqs:
+        yield row([mcq['question'], *(mcq['choices'].get(k, "") for k in "ABCD"),
+                   mcq['correct'], mcq['explanation']])
+
+GIFT_SPECIAL_RE = re.compile(r"([~=#{}:\\])")
+
+def gift_escape(text):
+    return GIFT_SPECIAL_RE.sub(r"\\\1", str(text)).replace("\n", " ")
+
+@register_exporter('gift', 'text/plain', 'gift.txt')
+def export_gift(mcqs):
+    """Moodle GIFT: one block per gradable question (see gradable_mcqs), explanation as general feedback"""
+    for i, mcq in enumerate(gradable_mcqs(mcqs), 1):
+        lines = [f"::Q{i}:: {gift_escape(mcq['question'])} {{\n"]
+        for choice, text in mcq['choices'].items():
+            lines.append(f"\t{'=' if choice == mcq['correct'] else '~'}{gift_escape(text)}\n")
+        lines.append(f"\t####{gift_escape(mcq['explanation'])}\n}}\n\n")
+        yield "".join(lines)
+
+@register_exporter('moodle', 'application/xml', 'moodle.xml')
+def export_moodle_xml(mcqs):
+    """Moodle XML quiz of single-answer multichoice questions, gradable ones only"""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<quiz>\n'
+    for i, mcq in enumerate(gradable_mcqs(mcqs), 1):
+        lines = [
+            '  <question type="multichoice">\n',
+            f'    <name><text>Q{i}</text></name>\n',
+            f'    <questiontext format="plain_text"><text>{xml_escape(str(mcq["question"]))}</text></questiontext>\n',
+            f'    <generalfeedback format="plain_text"><text>{xml_escape(str(mcq["explanation"]))}</text></generalfeedback>\n',
+            '    <single>true</single>\n    <shuffleanswers>true</shuffleanswers>\n'
+            '    <answernumbering>ABCD</answernumbering>\n',
+        ]
+        for choice, text in mcq['choices'].items():
+            fraction = 100 if choice == mcq['correct'] else 0
+            lines.append(f'    <answer fraction="{fraction}" format="plain_text"><text>{xml_escape(str(text))}</text></answer>\n')
+        lines.append('  </question>\n')
+        yield "".join(lines)
+    yield '</quiz>\n'
+
+@register_exporter('qti', 'application/xml', 'qti.xml')
+def export_qti(mcqs):
+    """IMS QTI 1.2 assessment, one single-response item per gradable question"""
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2">\n'
+           '  <assessment ident="mcqs" title="MCQs">\n    <section ident="root_section">\n')
+    for i, mcq in enumerate(gradable_mcqs(mcqs), 1):
+        lines = [
+            f'      <item ident="q{i}" title="Question {i}">\n',
+            '        <presentation>\n',
+            f'          <material><mattext texttype="text/plain">{xml_escape(str(mcq["question"]))}</mattext></material>\n',
+            f'          <response_lid ident="response{i}" rcardinality="Single">\n            <render_choice>\n',
+        ]
+        for choice, text in mcq['choices'].items():
+            lines.append(f'              <response_label ident="{xml_escape(choice)}"><material>'
+                         f'<mattext texttype="text/plain">{xml_escape(str(text))}</mattext></material></response_label>\n')
+        lines += [
+            '            </render_choice>\n          </response_lid>\n        </presentation>\n',
+            '        <resprocessing>\n'
+            '          <outcomes><decvar varname="SCORE" vartype="Decimal" minvalue="0" maxvalue="100"/></outcomes>\n',
+            f'          <respcondition continue="No"><conditionvar><varequal respident="response{i}">'
+            f'{xml_escape(str(mcq["correct"]))}</varequal></conditionvar>'
+            '<setvar action="Set" varname="SCORE">100</setvar></respcondition>\n',
+            '          <respcondition continue="Yes"><conditionvar><other/></conditionvar>'
+            '<displayfeedback feedbacktype="Response" linkrefid="general"/></respcondition>\n'
+            '        </resprocessing>\n',
+            f'        <itemfeedback ident="general"><material><mattext texttype="text/plain">'
+            f'{xml_escape(str(mcq["explanation"]))}</mattext></material></itemfeedback>\n',
+            '      </item>\n',
+        ]
+        yield "".join(lines)
+    yield '    </section>\n  </assessment>\n</questestinterop>\n'
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable target for zipfile; the streaming writer drains what was written"""
+    
+    def __init__(self):
+        self.pieces = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, b):
+        if b:
+            self.pieces.append(bytes(b))
+        return len(b)
+    
+    def drain(self):
+        data = b"".join(self.pieces)
+        self.pieces = []
+        return data
+
+@register_exporter('zip', 'application/zip')
+def export_zip(mcqs):
+    """Every other format in one archive, compressed and streamed in a single pass"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, exp in EXPORTERS.items():
+            if name == 'zip':
+                continue
+            with zf.open(f"mcqs.{exp.extension}", "w") as member:
+                for piece in exp.write(mcqs):
+                    member.write(piece.encode("utf-8") if isinstance(piece, str) else piece)
+                    if sink.pieces:
+                        yield sink.drain()
+    yield sink.drain()
+
+@app.route('/download/<format>/<result_id>')
+def download_result(format, result_id):
+    """Download a stored job result; results never change, so the id doubles as ETag"""
+    if format not in EXPORTERS:
+        return jsonify({'error': f'Unknown format: {format}'}), 400
+    etag = f"{result_id}-{format}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        mcq_data = load_result(result_id)
+        if mcq_data is None:
+            return jsonify({'error': 'Unknown or expired result id'}), 404
+        response = export_response(format, mcq_data, f'mcqs_{result_id[:12]}')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={RESULT_TTL}, immutable'
+    return response
+
 @app.route('/download/<format>')
 def download_mcqs(format):
-    """Download MCQs in specified format"""
+    """Download MCQs passed in the query string (kept for old clients; prefer result ids)"""
     mcqs = request.args.get('data')
     if not mcqs:
         return jsonify({'error': 'No data provided'}), 400
+    if format not in EXPORTERS:
+        return jsonify({'error': f'Unknown format: {format}'}), 400
     
     try:
         mcq_data = json.loads(mcqs)
+        if not isinstance(mcq_data, list):
+            return jsonify({'error': 'data must be a JSON list of questions'}), 400
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        if format == 'json':
-            output = io.StringIO()
-            json.dump(mcq_data, output, ensure_ascii=False, indent=2)
-            output.seek(0)
-            
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='application/json',
-                as_attachment=True,
-                download_name=f'mcqs_{timestamp}.json'
-            )
-            
-        elif format == 'txt':
-            output = io.StringIO()
-            for i, mcq in enumerate(mcq_data, 1):
-                output.write(f"Question {i}: {mcq['question']}\n\n")
-                for choice, text in mcq['choices'].items():
-                    marker = "✓ " if choice == mcq['correct'] else "  "
-                    output.write(f"{marker}{choice}) {text}\n")
-                output.write(f"\nExplanation: {mcq['explanation']}\n")
-                output.write("-" * 80 + "\n\n")
-            
-            output.seek(0)
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/plain',
-                as_attachment=True,
-                download_name=f'mcqs_{timestamp}.txt'
-            )
-            
+        return export_response(format, mcq_data, f'mcqs_{timestamp}')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -610,6 +2697,17 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
             gap: 20px;
         }
         
+        .checkbox-group label {
+            display: flex;
+            align-items: center;
+            gap: 10px;
+            font-weight: 500;
+        }
+        
+        .checkbox-group input {
+            width: auto;
+        }
+        
         .generate-btn {
             background: linear-gradient(135deg, #ff6b6b, #4ecdc4);
             color: white;
@@ -858,6 +2956,13 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
                     </div>
                 </div>
                 
+                <div class="form-group checkbox-group">
+                    <label for="fresh">
+                        <input type="checkbox" id="fresh" name="fresh">
+                        Fresh questions (don't reuse cached responses)
+                    </label>
+                </div>
+                
                 <button type="submit" class="generate-btn" id="generate-btn">
                     Generate MCQs
                 </button>
@@ -881,6 +2986,11 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
                 <div class="download-buttons">
                     <button class="download-btn" onclick="downloadMCQs('json')">Download JSON</button>
                     <button class="download-btn" onclick="downloadMCQs('txt')">Download TXT</button>
+                    <button class="download-btn" onclick="downloadMCQs('csv')">Download CSV</button>
+                    <button class="download-btn" onclick="downloadMCQs('gift')">Download GIFT</button>
+                    <button class="download-btn" onclick="downloadMCQs('moodle')">Download Moodle XML</button>
+                    <button class="download-btn" onclick="downloadMCQs('qti')">Download QTI</button>
+                    <button class="download-btn" onclick="downloadMCQs('zip')">Download all (ZIP)</button>
                 </div>
             </div>
             <div id="mcq-container"></div>
@@ -891,6 +3001,8 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
 
    <script>
         let currentMCQs = [];
+        let currentResultId = null;
+        let streamedBatches = {};
         let eventSource = null;
 
         document.getElementById('mcq-form').addEventListener('submit', async function(e) {
@@ -900,7 +3012,8 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
             const data = {
                 url: formData.get('url'),
                 language: formData.get('language'),
-                num_questions: formData.get('num_questions')
+                num_questions: formData.get('num_questions'),
+                fresh: formData.get('fresh') === 'on'
             };
             
             // Show progress section and hide others
@@ -909,9 +3022,8 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
             document.getElementById('error').style.display = 'none';
             document.getElementById('generate-btn').disabled = true;
             document.getElementById('progress-container').innerHTML = '';
-            
-            // Start listening to progress updates
-            startProgressUpdates();
+            document.getElementById('mcq-container').innerHTML = '';
+            streamedBatches = {};
             
             try {
                 const response = await fetch('/process', {
@@ -922,42 +3034,75 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
                     body: JSON.stringify(data)
                 });
                 
-                const result = await response.json();
+                const job = await response.json();
+                if (!response.ok) {
+                    throw new Error(job.error || 'Unknown error occurred');
+                }
+                
+                const result = await waitForJob(job.job_id);
                 
                 if (result.success) {
                     currentMCQs = result.mcqs;
-                    // Wait a bit for final progress updates
-                    setTimeout(() => {
-                        displayResults(result);
-                        stopProgressUpdates();
-                    }, 1000);
+                    currentResultId = result.result_id || null;
+                    displayResults(result);
+                    stopProgressUpdates();
                 } else {
                     showError(result.error || 'Unknown error occurred');
                     stopProgressUpdates();
                 }
                 
             } catch (error) {
-                showError('Network error: ' + error.message);
+                showError('Error: ' + error.message);
                 stopProgressUpdates();
             } finally {
                 document.getElementById('generate-btn').disabled = false;
             }
         });
 
-        function startProgressUpdates() {
+        function waitForJob(jobId) {
+            // Follow the job's progress stream; the server ends it with an
+            // 'end' event once the job has finished, then fetch the result
+            return new Promise((resolve, reject) => {
+                startProgressUpdates(jobId, async () => {
+                    try {
+                        const response = await fetch(`/jobs/${jobId}/result`);
+                        resolve(await response.json());
+                    } catch (error) {
+                        reject(error);
+                    }
+                }, reject);
+            });
+        }
+
+        function startProgressUpdates(jobId, onEnd, onFail) {
             if (eventSource) {
                 eventSource.close();
             }
             
-            eventSource = new EventSource('/progress');
+            // EventSource reconnects by itself and sends Last-Event-ID,
+            // so a dropped connection resumes where it left off
+            eventSource = new EventSource(`/jobs/${jobId}/progress`);
             
             eventSource.onmessage = function(event) {
                 const progress = JSON.parse(event.data);
                 addProgressItem(progress);
             };
             
+            eventSource.addEventListener('mcqs', function(event) {
+                addStreamedQuestions(JSON.parse(event.data));
+            });
+            
+            eventSource.addEventListener('end', function() {
+                stopProgressUpdates();
+                onEnd();
+            });
+            
             eventSource.onerror = function(error) {
                 console.error('Progress stream error:', error);
+                if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+                    stopProgressUpdates();
+                    onFail(new Error('Lost connection to progress stream'));
+                }
             };
         }
 
@@ -999,6 +3144,36 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
         }
 
         // [Keep your existing displayResults, showError, and downloadMCQs functions unchanged]
+        function renderMCQ(mcq, index) {
+            return `
+                <div class="mcq-item">
+                    <div class="mcq-question">${index + 1}. ${mcq.question}</div>
+                    <div class="mcq-choices">
+                        ${Object.entries(mcq.choices).map(([key, value]) => 
+                            `<div class="choice ${key === mcq.correct ? 'correct' : 'incorrect'}">
+                                ${key}) ${value}
+                            </div>`
+                        ).join('')}
+                    </div>
+                    <div class="mcq-explanation">
+                        <strong>Explanation:</strong> ${mcq.explanation}
+                    </div>
+                </div>
+            `;
+        }
+
+        function addStreamedQuestions(batch) {
+            // Questions arrive in completion order; keep them in chunk order on screen
+            streamedBatches[batch.chunk] = (streamedBatches[batch.chunk] || []).concat(batch.mcqs);
+            const chunks = Object.keys(streamedBatches).map(Number).sort((a, b) => a - b);
+            const mcqs = chunks.flatMap(chunk => streamedBatches[chunk]);
+            
+            document.getElementById('mcq-container').innerHTML = `
+                <div class="info">Receiving questions... ${mcqs.length} so far</div>
+            ` + mcqs.map(renderMCQ).join('');
+            document.getElementById('results').style.display = 'block';
+        }
+
         function displayResults(result) {
             const container = document.getElementById('mcq-container');
             const info = result.transcript_info;
@@ -1009,26 +3184,11 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
                     <strong>Video Info:</strong> ${info.language} transcript (${info.source}), 
                     ${info.length} segments, ${info.text_length.toLocaleString()} characters<br>
                     <strong>Generation:</strong> ${genInfo.questions_generated} questions from ${genInfo.chunks_used} chunks
+                    ${genInfo.partial ? `<br><strong>Partial result:</strong> the ${genInfo.time_budget}s time budget ran out` : ''}
                 </div>
             `;
             
-            result.mcqs.forEach((mcq, index) => {
-                html += `
-                    <div class="mcq-item">
-                        <div class="mcq-question">${index + 1}. ${mcq.question}</div>
-                        <div class="mcq-choices">
-                            ${Object.entries(mcq.choices).map(([key, value]) => 
-                                `<div class="choice ${key === mcq.correct ? 'correct' : 'incorrect'}">
-                                    ${key}) ${value}
-                                </div>`
-                            ).join('')}
-                        </div>
-                        <div class="mcq-explanation">
-                            <strong>Explanation:</strong> ${mcq.explanation}
-                        </div>
-                    </div>
-                `;
-            });
+            html += result.mcqs.map(renderMCQ).join('');
             
             container.innerHTML = html;
             document.getElementById('results').style.display = 'block';
@@ -1046,6 +3206,10 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
                 return;
             }
             
+            if (currentResultId) {
+                window.location.href = `/download/${format}/${currentResultId}`;
+                return;
+            }
             const data = encodeURIComponent(JSON.stringify(currentMCQs));
             window.location.href = `/download/${format}?data=${data}`;
         }
@@ -1064,7 +3228,8 @@ if __name__ == '__main__':
     
     # Create output directories
     Path("out_mcq").mkdir(exist_ok=True)
-    Path("debug_raw").mkdir(exist_ok=True)
+    if DEBUG_RAW_DIR:
+        DEBUG_RAW_DIR.mkdir(parents=True, exist_ok=True)
     
     print("Starting YouTube to MCQ Generator...")
     print("Open http://localhost:5000 in your browser")
@@ -0,0 +1,80 @@
+"""split_into_chunks on 1 h, 5 h and 10 h synthetic transcripts.
+
+Compares the original paragraph/sentence splitter against the current
+one-pass chunker, for punctuated ("manual") and unpunctuated continuous
+("auto") captions. Fully offline.
+
+    python benchmarks/bench_chunker.py
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app  # noqa: E402
+from benchmarks.synthetic import make_transcript_hours  # noqa: E402
+
+
+def split_into_chunks_v1(text, max_chars=8000):
+    """The splitter this module replaced, kept for comparison"""
+    paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    chunks, buf, cur = [], [], 0
+    for p in paras:
+        if cur + len(p) + 2 <= max_chars:
+            buf.append(p)
+            cur += len(p) + 2
+        else:
+            if buf:
+                chunks.append("\n\n".join(buf))
+            buf = [p]
+            cur = len(p) + 2
+            if cur > max_chars:
+                sentences = re.split(r'[.!?]+', p)
+                temp_chunk = ""
+                for sent in sentences:
+                    if len(temp_chunk) + len(sent) < max_chars:
+                        temp_chunk += sent + ". "
+                    else:
+                        if temp_chunk.strip():
+                            chunks.append(temp_chunk.strip())
+                        temp_chunk = sent + ". "
+                if temp_chunk.strip():
+                    buf = [temp_chunk.strip()]
+                    cur = len(temp_chunk)
+                else:
+                    buf = []
+                    cur = 0
+    if buf:
+        chunks.append("\n\n".join(buf))
+    return chunks
+
+
+def best_of(fn, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    chunk_tokens = 2000
+    print(f"{'input':<12}{'chars':>12}{'splitter':>10}{'time ms':>10}{'chunks':>8}{'largest':>10}")
+    for style in ("manual", "auto"):
+        for hours in (1, 5, 10):
+            text = app.segments_to_plain_text(make_transcript_hours(hours, style=style))
+            max_chars = chunk_tokens * 4
+            runs = (
+                ("v1", lambda: split_into_chunks_v1(text, max_chars=max_chars)),
+                ("current", lambda: app.split_into_chunks(text, max_tokens=chunk_tokens)),
+            )
+            for name, fn in runs:
+                elapsed, chunks = best_of(fn)
+                print(f"{f'{style} {hours}h':<12}{len(text):>12,}{name:>10}{elapsed * 1000:>10.1f}"
+                      f"{len(chunks):>8}{max(map(len, chunks)):>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""dedupe_mcqs on synthetic banks of 100 to 10k questions.
+
+Compares the prefix-filtered pass against exhaustive pairwise Jaccard
+comparison (same shingles, same answer test, same threshold) for speed and
+for how many duplicates each finds, then checks that both keep exactly the
+same questions across thresholds, including a bank of short questions
+whose similarities land exactly on them, and that template questions
+differing only in their subject and answer are all kept. Exits non-zero
+on any difference. Fully offline.
+
+    python benchmarks/bench_dedupe.py
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app  # noqa: E402
+from benchmarks.synthetic import WORDS, make_mcq_bank_with_duplicates  # noqa: E402
+
+CHECK_THRESHOLDS = (0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.75, 0.9)
+
+
+def dedupe_pairwise(mcq_list, threshold=app.DEDUP_THRESHOLD):
+    """Every question against every kept one, for comparison"""
+    num, den = app.jaccard_ratio(threshold)
+    kept, kept_shingles, dropped = [], [], 0
+    for q in mcq_list:
+        shingles, answer = app.mcq_shingles(q), app.mcq_answer(q)
+        if any(a == answer and len(shingles & s) * den >= num * len(shingles | s) for s, a in kept_shingles):
+            dropped += 1
+            continue
+        kept_shingles.append((shingles, answer))
+        kept.append(q)
+    return kept, dropped
+
+
+# Same wording, different subject and answer: never duplicates
+TEMPLATE_PAIRS = (
+    ("What is the capital of France?", "Paris", "What is the capital of Germany?", "Berlin"),
+    ("Which planet is closest to the Sun?", "Mercury", "Which planet is farthest from the Sun?", "Neptune"),
+    ("What is the boiling point of water at sea level?", "100 °C",
+     "What is the freezing point of water at sea level?", "0 °C"),
+    ("Kāda ir Latvijas galvaspilsēta?", "Rīga", "Kāda ir Igaunijas galvaspilsēta?", "Tallina"),
+    ("In which year did the war begin?", "1914", "In which year did the war end?", "1918"),
+)
+
+
+def make_template_bank():
+    def mcq(question, answer):
+        return {"question": question, "choices": {"A": answer, "B": "x", "C": "y", "D": "z"},
+                "correct": "A", "explanation": "e"}
+    return [mcq(q, a) for q1, a1, q2, a2 in TEMPLATE_PAIRS for q, a in ((q1, a1), (q2, a2))]
+
+
+def make_short_bank(count, seed=0):
+    """Questions of 2-7 words from a small vocabulary, so Jaccard ratios often equal the threshold"""
+    rng = random.Random(seed)
+    vocab = WORDS[:12]
+    return [{"question": " ".join(rng.choice(vocab) for _ in range(rng.randint(2, 7))),
+             "choices": {"A": "a", "B": "b", "C": "c", "D": "d"}, "correct": rng.choice("AB"), "explanation": "e"}
+            for _ in range(count)]
+
+
+def check_identical():
+    """Thresholds at which the two methods keep different questions, as (bank, threshold, indexed, pairwise)"""
+    banks = (("dup 1k", make_mcq_bank_with_duplicates(1_000)), ("short 2k", make_short_bank(2_000)),
+             ("templates", make_template_bank()))
+    diffs = []
+    for name, bank in banks:
+        for t in CHECK_THRESHOLDS:
+            indexed, _ = app.dedupe_mcqs(bank, threshold=t)
+            pairwise, _ = dedupe_pairwise(bank, threshold=t)
+            if list(map(id, indexed)) != list(map(id, pairwise)):
+                diffs.append((name, t, len(indexed), len(pairwise)))
+    return diffs
+
+
+def best_of(fn, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    print(f"{'bank':>8}{'method':>10}{'time ms':>12}{'dropped':>10}")
+    for size in (100, 1_000, 5_000, 10_000):
+        bank = make_mcq_bank_with_duplicates(size)
+        runs = [("indexed", lambda: app.dedupe_mcqs(bank))]
+        if size <= 5_000:
+            runs.append(("pairwise", lambda: dedupe_pairwise(bank)))
+        for name, fn in runs:
+            elapsed, (_, dropped) = best_of(fn, repeat=1 if name == "pairwise" else 3)
+            print(f"{size:>8,}{name:>10}{elapsed * 1000:>12.1f}{dropped:>10}")
+    
+    diffs = check_identical()
+    for name, t, indexed, pairwise in diffs:
+        print(f"MISMATCH {name} at threshold {t}: indexed keeps {indexed}, pairwise {pairwise}")
+    templates = make_template_bank()
+    kept, _ = app.dedupe_mcqs(templates)
+    for q in templates:
+        if q not in kept:
+            print(f"MERGED template question with a different answer: {q['question']!r}")
+    if diffs or len(kept) < len(templates):
+        sys.exit(1)
+    print(f"indexed and pairwise keep the same questions at thresholds {', '.join(map(str, CHECK_THRESHOLDS))}")
+    print(f"all {len(templates)} template questions kept at threshold {app.DEDUP_THRESHOLD}")
+
+
+if __name__ == "__main__":
+    main()
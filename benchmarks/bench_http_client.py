@@ -0,0 +1,102 @@
+"""Per-call overhead of call_pplx: fresh requests.post vs the pooled session.
+
+Runs fully offline against a local HTTP/1.1 server that answers every
+POST with a canned chat completion, so the numbers isolate client-side
+connection setup and request building from model latency.
+
+    python benchmarks/bench_http_client.py --calls 500 --workers 4
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app  # noqa: E402
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "[]"}, "finish_reason": "stop"}]
+}).encode("utf-8")
+
+
+class CannedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open between requests
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def call_unpooled(model, messages, max_tokens=900, temperature=0.3, timeout=120):
+    """The original call_pplx: new connection and headers on every call"""
+    headers = {"Authorization": f"Bearer {app.API_KEY}", "Content-Type": "application/json"}
+    payload = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+    r = requests.post(app.PPLX_API_URL, headers=headers, data=json.dumps(payload), timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+    return data["choices"][0]["message"]["content"], data
+
+
+def call_pooled(model, messages, **kwargs):
+    return app.call_pplx(model, messages, use_cache=False, **kwargs)
+
+
+def run(fn, calls, workers):
+    messages = app.build_mcq_prompt("Some transcript text. " * 200, lang="en", n=3)
+    latencies = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        fn(app.MODEL, messages)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, range(calls)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "calls_per_s": calls / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CannedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.PPLX_API_URL = f"http://127.0.0.1:{server.server_port}/chat/completions"
+
+    try:
+        for name, fn in (("requests.post", call_unpooled), ("pooled session", call_pooled)):
+            fn(app.MODEL, [{"role": "user", "content": "warm-up"}])
+            res = run(fn, args.calls, args.workers)
+            print(f"{name:<16} {res['calls_per_s']:8.0f} calls/s   "
+                  f"p50 {res['p50_ms']:6.2f} ms   p99 {res['p99_ms']:6.2f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
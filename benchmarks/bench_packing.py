@@ -0,0 +1,60 @@
+"""Packed versus one-chunk-per-request generation against the local stand-in.
+
+Runs generate_mcq_with_progress on a synthetic transcript twice, without
+and with packing, and reports the HTTP requests the stand-in served, wall
+time and questions returned. Exits non-zero if the packed run does not
+issue fewer requests than the unpacked one, or returns fewer questions.
+
+    python benchmarks/bench_packing.py
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app  # noqa: E402
+from benchmarks.pplx_standin import StandinConfig, serve  # noqa: E402
+from benchmarks.synthetic import make_transcript_hours  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=1)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--chunk-tokens", type=int, default=1000)
+    parser.add_argument("--latency-median", type=float, default=0.2, help="stand-in latency, seconds")
+    args = parser.parse_args()
+
+    config = StandinConfig(latency_median=args.latency_median, latency_sigma=0.2, seed=0)
+    server = serve(config)
+    app.PPLX_API_URL = f"http://127.0.0.1:{server.server_port}/chat/completions"
+    app.rate_limiter = app.RateLimiter()  # measure request counts, not the client-side throttle
+    app.STREAM_COMPLETIONS = False
+
+    text = app.segments_to_plain_text(make_transcript_hours(args.hours))
+    chunks = app.split_into_chunks(text, max_tokens=args.chunk_tokens)
+    per_chunk = max(1, -(-args.questions // len(chunks)))
+    print(f"{len(chunks)} chunks, {args.questions} questions, {per_chunk} per chunk")
+    print(f"{'mode':<10}{'requests':>10}{'time s':>9}{'questions':>11}")
+    runs = {}
+    try:
+        for name, pack in (("unpacked", False), ("packed", True)):
+            before = config.stats["requests"]
+            t0 = time.perf_counter()
+            mcqs, _, _, _ = app.generate_mcq_with_progress(
+                chunks, lang="en", model=app.MODEL, per_chunk=per_chunk, total=args.questions,
+                use_cache=False, pack=pack)
+            runs[name] = (config.stats["requests"] - before, len(mcqs))
+            print(f"{name:<10}{runs[name][0]:>10}{time.perf_counter() - t0:>9.2f}{len(mcqs):>11}")
+    finally:
+        server.shutdown()
+
+    (plain_requests, plain_questions), (packed_requests, packed_questions) = runs["unpacked"], runs["packed"]
+    if packed_requests >= plain_requests or packed_questions < plain_questions:
+        print("\npacking did not save requests")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""parse_mcq_content against the regex repair chain it replaced.
+
+Times both parsers on synthetic replies for every failure mode in
+synthetic.LLM_OUTPUT_KINDS and counts the questions that survive
+validate_mcq_list, then replays a regression corpus of real failed
+replies through both the parsers and MCQStreamParser (fed in small pieces,
+as a streamed completion arrives). Corpus files are named
+``<name>.<expected valid questions>.txt``; the script exits non-zero if
+the current parser or the stream parser recovers fewer than expected from
+any of them. Fully offline.
+
+    python benchmarks/bench_parser.py
+    python benchmarks/bench_parser.py --corpus debug_raw
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app  # noqa: E402
+from benchmarks.synthetic import make_llm_outputs  # noqa: E402
+
+CORPUS_DIR = Path(__file__).resolve().parent / "parser_corpus"
+
+
+def parse_json_repair_v1(s):
+    """The regex repair chain this module replaced, kept for comparison"""
+    t = s.strip().replace("\r\n", "\n")
+    t = re.sub(r",\s*([\]}])", r"\1", t)
+    t = re.sub(r'(?P<pre>[\{\s,])\'(?P<key>[^\'\n\r\t]+)\'\s*:', r'\g<pre>"\g<key>":', t)
+    t = re.sub(r':\s*\'(?P<val>[^\'\\\n\r]*)\'(?P<post>[\s,\}\]])', r': "\g<val>"\g<post>', t)
+    fa, la = t.find("["), t.rfind("]")
+    fo, lo = t.find("{"), t.rfind("}")
+    if fa != -1 and la != -1 and fa < la:
+        t = t[fa:la + 1]
+    elif fo != -1 and lo != -1 and fo < lo:
+        t = t[fo:lo + 1]
+    return json.loads(t)
+
+
+class MCQStreamParserV1(app.MCQStreamParser):
+    @staticmethod
+    def _parse_object(text):
+        try:
+            obj = json.loads(text)
+        except Exception:
+            try:
+                obj = parse_json_repair_v1(text)
+            except Exception:
+                return None
+        return obj if isinstance(obj, dict) else None
+
+
+def parse_mcq_content_v1(content):
+    try:
+        parsed = json.loads(content.strip())
+    except Exception:
+        try:
+            parsed = parse_json_repair_v1(content)
+        except Exception:
+            parser = MCQStreamParserV1()
+            parser.feed(content)
+            if not parser.objects:
+                raise ValueError("unparseable JSON response")
+            parsed = parser.objects
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    if not isinstance(parsed, list):
+        return []
+    return parsed
+
+
+def parse_stream(content, piece=7):
+    """The objects MCQStreamParser completes when ``content`` arrives ``piece`` characters at a time"""
+    parser = app.MCQStreamParser()
+    for k in range(0, len(content), piece):
+        parser.feed(content[k:k + piece])
+    return parser.objects
+
+
+PARSERS = (("v1", parse_mcq_content_v1), ("current", app.parse_mcq_content))
+
+
+def recovered(parse, text):
+    """Valid questions recovered from one reply; 0 if it does not parse"""
+    try:
+        parsed = parse(text)
+    except ValueError:
+        return 0
+    _, issues = app.validate_mcq_list(parsed)
+    return len(parsed) - len({i for i, _ in issues})
+
+
+def run_synthetic(count, repeat=3):
+    outputs = make_llm_outputs(count)
+    by_kind = defaultdict(list)
+    for kind, text in outputs:
+        by_kind[kind].append(text)
+    print(f"{'kind':<22}{'replies':>8}{'parser':>10}{'time ms':>10}{'valid':>8}")
+    for kind, texts in by_kind.items():
+        for name, parse in PARSERS:
+            best, valid = float("inf"), 0
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                valid = sum(recovered(parse, t) for t in texts)
+                best = min(best, time.perf_counter() - t0)
+            print(f"{kind:<22}{len(texts):>8}{name:>10}{best * 1000:>10.1f}{valid:>8}")
+
+
+def run_corpus(corpus):
+    paths = sorted(corpus.glob("*.txt"))
+    if not paths:
+        print(f"\nno replies in {corpus}")
+        return 0
+    print(f"\n{'corpus file':<40}{'expected':>9}{'v1':>5}{'current':>9}{'stream':>8}")
+    failures = 0
+    for path in paths:
+        text = path.read_text(encoding="utf-8", errors="replace")
+        stem = path.stem.rsplit(".", 1)
+        expected = int(stem[1]) if len(stem) == 2 and stem[1].isdigit() else None
+        old, new = (recovered(parse, text) for _, parse in PARSERS)
+        streamed = recovered(parse_stream, text)
+        mark = ""
+        if expected is not None and min(new, streamed) < expected:
+            failures += 1
+            mark = "  FAIL"
+        shown = "-" if expected is None else expected
+        print(f"{path.name:<40}{shown:>9}{old:>5}{new:>9}{streamed:>8}{mark}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--count", type=int, default=2000, help="synthetic replies (default 2000)")
+    ap.add_argument("--corpus", type=Path, default=CORPUS_DIR,
+                    help="directory of raw replies (default benchmarks/parser_corpus)")
+    args = ap.parse_args()
+    run_synthetic(args.count)
+    failures = run_corpus(args.corpus)
+    if failures:
+        print(f"\n{failures} corpus file(s) below the expected count")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Fire N concurrent /process jobs at a running app and report throughput and tail latency.
+
+Run the app against the stand-in so no API credits are spent:
+
+    python benchmarks/pplx_standin.py --port 8787 &
+    PPLX_BASE_URL=http://127.0.0.1:8787 MCQ_CACHE_DIR=/tmp/mcq-load python app.py &
+    MCQ_CACHE_DIR=/tmp/mcq-load python benchmarks/load_driver.py --jobs 50 --concurrency 10 --seed-transcripts
+
+--seed-transcripts writes synthetic transcripts for fake video ids into
+the transcript cache the app reads (same MCQ_CACHE_DIR), so YouTube is
+not contacted either. Without it, pass real URLs with --urls.
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app  # noqa: E402
+from benchmarks.synthetic import make_transcript_hours  # noqa: E402
+
+
+def seed_transcripts(count, lang, hours):
+    urls = []
+    for i in range(count):
+        vid = f"loadtest{i:03d}"
+        segments = make_transcript_hours(hours, style="manual", seed=i)
+        app.store_transcript(vid, (lang, "en"), segments, lang, "manual")
+        urls.append(f"https://youtu.be/{vid}")
+    return urls
+
+
+def run_job(base_url, url, lang, questions, poll, timeout):
+    session = requests.Session()
+    t0 = time.perf_counter()
+    r = session.post(f"{base_url}/process", json={"url": url, "language": lang,
+                                                  "num_questions": questions, "fresh": True}, timeout=30)
+    if r.status_code != 202:
+        return {"ok": False, "latency": time.perf_counter() - t0, "error": r.text[:200]}
+    job_id = r.json()["job_id"]
+    while time.perf_counter() - t0 < timeout:
+        status = session.get(f"{base_url}/jobs/{job_id}", timeout=30).json()["status"]
+        if status in ("done", "failed"):
+            break
+        time.sleep(poll)
+    result = session.get(f"{base_url}/jobs/{job_id}/result", timeout=30)
+    latency = time.perf_counter() - t0
+    if result.status_code != 200:
+        return {"ok": False, "latency": latency, "error": result.text[:200]}
+    return {"ok": True, "latency": latency, "questions": len(result.json()["mcqs"])}
+
+
+def pct(values, q):
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--urls", help="file with real YouTube URLs to cycle through")
+    parser.add_argument("--seed-transcripts", action="store_true",
+                        help="use synthetic transcripts for fake video ids (needs the app's MCQ_CACHE_DIR)")
+    parser.add_argument("--transcript-hours", type=float, default=0.5)
+    parser.add_argument("--poll", type=float, default=0.25, help="status poll interval, seconds")
+    parser.add_argument("--timeout", type=float, default=900, help="per-job timeout, seconds")
+    args = parser.parse_args()
+
+    if args.seed_transcripts:
+        urls = seed_transcripts(min(args.jobs, 50), args.lang, args.transcript_hours)
+    elif args.urls:
+        urls = [u.strip() for u in Path(args.urls).read_text().splitlines() if u.strip()]
+    else:
+        parser.error("pass --seed-transcripts or --urls")
+
+    base_url = args.app_url.rstrip("/")
+    results = []
+    lock = threading.Lock()
+
+    def one(i):
+        res = run_job(base_url, urls[i % len(urls)], args.lang, args.questions, args.poll, args.timeout)
+        with lock:
+            results.append(res)
+            done = len(results)
+        if not res["ok"]:
+            print(f"job {i}: FAILED {res['error']}")
+        elif done % max(1, args.jobs // 10) == 0:
+            print(f"{done}/{args.jobs} jobs finished")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.jobs)))
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r["ok"]]
+    lat = sorted(r["latency"] for r in ok)
+    print(f"\n{len(ok)}/{len(results)} jobs succeeded in {wall:.1f} s "
+          f"({len(ok) / wall:.2f} jobs/s, concurrency {args.concurrency})")
+    if lat:
+        print(f"latency s: p50 {pct(lat, 0.5):.2f}  p90 {pct(lat, 0.9):.2f}  "
+              f"p99 {pct(lat, 0.99):.2f}  max {lat[-1]:.2f}  mean {statistics.fmean(lat):.2f}")
+        print(f"questions per job: mean {statistics.fmean(r['questions'] for r in ok):.1f} "
+              f"(requested {args.questions})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Local OpenAI-compatible chat-completions stand-in for the Perplexity API.
+
+Answers POST /chat/completions with synthetic MCQ arrays sized to the
+question count in the prompt (keyed per section for packed prompts), so
+the whole app can be exercised without an API key or credits. Latency,
+error rates and output defects are tunable:
+
+    python benchmarks/pplx_standin.py --port 8787 --latency-median 2.5 --latency-sigma 0.6 \
+        --rate-429 0.05 --rate-5xx 0.02 --truncate 0.05 --malformed 0.05
+    PPLX_BASE_URL=http://127.0.0.1:8787 python app.py
+
+Latency is lognormal around --latency-median; with "stream": true the
+same time is spread over the streamed tokens (first token after
+--ttft-fraction of it). Replies longer than max_tokens are cut off with
+finish_reason "length", as the real API does.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.synthetic import make_mcq  # noqa: E402
+
+QUESTION_COUNT_RE = re.compile(r"(?:questions|skaits)\s*:\s*(\d+)", re.IGNORECASE)
+SECTION_RE = re.compile(r"(?:Section|Sadaļa) (S\d+) - (?:number of questions|jautājumu skaits): (\d+)")
+CHARS_PER_TOKEN = 4
+
+
+class StandinConfig:
+    def __init__(self, latency_median=1.0, latency_sigma=0.5, ttft_fraction=0.2, rate_429=0.0,
+                 rate_5xx=0.0, truncate=0.0, malformed=0.0, retry_after=1, seed=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.ttft_fraction = ttft_fraction
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.truncate = truncate
+        self.malformed = malformed
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "429": 0, "5xx": 0, "truncated": 0, "malformed": 0, "streamed": 0}
+
+    def roll(self, p):
+        with self.lock:
+            return self.rng.random() < p
+
+    def latency(self):
+        with self.lock:
+            return self.latency_median * math.exp(self.rng.gauss(0, self.latency_sigma))
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+def build_reply(messages, rng):
+    """Synthetic JSON array with as many MCQs as the prompt asks for.
+    
+    A packed prompt (sections S1..Sn, see app.build_packed_prompt) gets an
+    object keyed by section id instead, each with its own count.
+    """
+    prompt = messages[-1]["content"] if messages else ""
+    sections = SECTION_RE.findall(prompt)
+    if sections:
+        reply, k = {}, 0
+        for sid, n in sections:
+            reply[sid] = [make_mcq(rng, k + i) for i in range(int(n))]
+            k += int(n)
+        return json.dumps(reply, ensure_ascii=False, indent=2)
+    m = QUESTION_COUNT_RE.search(prompt)
+    n = int(m.group(1)) if m else 3
+    bank = [make_mcq(rng, i) for i in range(n)]
+    return json.dumps(bank, ensure_ascii=False, indent=2)
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload, extra_headers=()):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in extra_headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                with config.lock:
+                    self.send_json(200, dict(config.stats))
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_json(404, {"error": "not found"})
+                return
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            config.count("requests")
+            delay = config.latency()
+
+            if config.roll(config.rate_429):
+                config.count("429")
+                time.sleep(min(delay, 0.05))
+                self.send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                               [("Retry-After", str(config.retry_after))])
+                return
+            if config.roll(config.rate_5xx):
+                config.count("5xx")
+                time.sleep(delay)
+                self.send_json(config.rng.choice((500, 502, 503)), {"error": {"message": "upstream error"}})
+                return
+
+            with config.lock:
+                content = build_reply(req.get("messages", []), config.rng)
+            finish_reason = "stop"
+            if config.roll(config.malformed):
+                config.count("malformed")
+                content = content.replace('"', "'").replace("}\n", "},\n", 1)
+            max_chars = int(req.get("max_tokens", 900)) * CHARS_PER_TOKEN
+            if len(content) > max_chars or config.roll(config.truncate):
+                config.count("truncated")
+                cut = min(max_chars, config.rng.randint(len(content) // 3, len(content) - 1))
+                content, finish_reason = content[:cut], "length"
+
+            completion_id = uuid.uuid4().hex
+            usage = {"prompt_tokens": sum(len(m.get("content", "")) for m in req.get("messages", []))
+                     // CHARS_PER_TOKEN,
+                     "completion_tokens": len(content) // CHARS_PER_TOKEN}
+            if req.get("stream"):
+                config.count("streamed")
+                self.stream(completion_id, req.get("model"), content, finish_reason, usage, delay)
+                return
+
+            time.sleep(delay)
+            self.send_json(200, {
+                "id": completion_id,
+                "model": req.get("model"),
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "choices": [{"index": 0, "finish_reason": finish_reason,
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+
+        def stream(self, completion_id, model, content, finish_reason, usage, delay):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(payload):
+                data = f"data: {payload}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def event(delta, reason=None, extra=None):
+                body = {"id": completion_id, "model": model, "object": "chat.completion.chunk",
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": reason}]}
+                body.update(extra or {})
+                send(json.dumps(body, ensure_ascii=False))
+
+            pieces = [content[i:i + CHARS_PER_TOKEN * 4] for i in range(0, len(content), CHARS_PER_TOKEN * 4)]
+            time.sleep(delay * config.ttft_fraction)
+            step = delay * (1 - config.ttft_fraction) / max(1, len(pieces))
+            try:
+                event({"role": "assistant", "content": ""})
+                for piece in pieces:
+                    event({"content": piece})
+                    time.sleep(step)
+                event({}, finish_reason, {"usage": usage})
+                send("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (e.g. a cancelled hedge)
+
+    return Handler
+
+
+def serve(config, host="127.0.0.1", port=0):
+    """Start the stand-in on a background thread; returns the server (server.server_port)"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-median", type=float, default=1.0, help="seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal sigma")
+    parser.add_argument("--ttft-fraction", type=float, default=0.2,
+                        help="share of the latency before the first streamed token")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--truncate", type=float, default=0.0, help="share of replies cut short")
+    parser.add_argument("--malformed", type=float, default=0.0, help="share of replies with broken JSON")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = StandinConfig(args.latency_median, args.latency_sigma, args.ttft_fraction, args.rate_429,
+                           args.rate_5xx, args.truncate, args.malformed, args.retry_after, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"Perplexity stand-in on http://{args.host}:{args.port} (GET /stats for counters)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Offline benchmark suite for the pipeline's text stages.
+
+Stages: segments_to_plain_text, normalize_segments, split_into_chunks,
+rank_chunks, parse_llm_json, validate_mcq_list and dedupe_mcqs, fed with synthetic
+manual-style, auto-caption-style and noisy rolling-caption transcripts
+(1k to 500k segments), a corpus of messy LLM replies and MCQ banks with
+reworded duplicates.
+For each case it reports throughput, p50/p99 latency per call and peak
+traced memory. The run stops if normalize_segments alters any of the
+rolling style's KEEP_PHRASES. Nothing touches the network.
+
+    python benchmarks/run_benchmarks.py --save benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --quick --stage parse_llm_json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    KEEP_PHRASES, make_segments, make_mcq_bank, make_mcq_bank_with_duplicates, make_llm_outputs,
+)
+
+SEGMENT_COUNTS = (1_000, 10_000, 100_000, 500_000)
+QUICK_SEGMENT_COUNTS = (1_000, 10_000)
+STYLES = ("manual", "auto", "rolling")
+REGRESSION_THRESHOLD = 0.15   # flag cases whose p50 grew by more than this
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def measure(fn, inputs, units, unit_name, min_time=0.5, max_runs=50):
+    """Time fn over inputs (repeating small inputs until min_time), then one traced run for memory"""
+    for item in inputs[:1]:  # warm-up
+        try:
+            fn(item)
+        except Exception:
+            pass
+    times = []
+    failures = 0
+    started = time.perf_counter()
+    runs = 0
+    while runs < max_runs:
+        for item in inputs:
+            t0 = time.perf_counter()
+            try:
+                fn(item)
+            except Exception:
+                failures += 1
+            times.append(time.perf_counter() - t0)
+        runs += 1
+        if time.perf_counter() - started >= min_time:
+            break
+
+    tracemalloc.start()
+    for item in inputs:
+        try:
+            fn(item)
+        except Exception:
+            pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times.sort()
+    total = sum(times)
+    return {
+        "calls": len(times),
+        "p50_ms": percentile(times, 0.50) * 1000,
+        "p99_ms": percentile(times, 0.99) * 1000,
+        "mean_ms": statistics.fmean(times) * 1000,
+        "throughput": units * runs / total if total else 0.0,
+        "unit": unit_name,
+        "peak_kib": peak / 1024,
+        "failure_rate": failures / len(times),
+    }
+
+
+def check_kept_phrases(raw, normalized):
+    """Stop the run if normalize_segments changed any of synthetic.KEEP_PHRASES"""
+    flat_raw, flat = " ".join(raw.split()), " ".join(normalized.split())
+    lost = [p for p in KEEP_PHRASES if flat.count(p) < flat_raw.count(p)]
+    if lost:
+        raise SystemExit(f"normalize_segments altered content: {', '.join(map(repr, lost))}")
+
+
+def bench_text_stages(counts):
+    for style in STYLES:
+        for count in counts:
+            segments = make_segments(count, style=style)
+            text = app.segments_to_plain_text(segments)
+            yield (f"segments_to_plain_text/{style}/{count}",
+                   measure(app.segments_to_plain_text, [segments], count, "segments/s"))
+            yield (f"normalize_segments/{style}/{count}",
+                   measure(lambda s: app.normalize_segments(s, lang="en"), [segments], count, "segments/s"))
+            check_kept_phrases(text, app.segments_to_plain_text(app.normalize_segments(segments, lang="en")))
+            yield (f"split_into_chunks/{style}/{count}",
+                   measure(lambda t: app.split_into_chunks(t, max_tokens=2000), [text],
+                           len(text) / 1e6, "MB/s"))
+            chunks, _ = app.split_into_target_chunks(text, app.TARGET_CHUNKS)
+            yield (f"rank_chunks/{style}/{count}",
+                   measure(app.rank_chunks, [chunks], len(text) / 1e6, "MB/s"))
+
+
+def bench_parse(corpus_size):
+    corpus = make_llm_outputs(corpus_size)
+    texts = [t for _, t in corpus]
+    yield (f"parse_llm_json/corpus/{corpus_size}",
+           measure(app.parse_llm_json, texts, len(texts), "replies/s"))
+    for kind in sorted({k for k, _ in corpus}):
+        subset = [t for k, t in corpus if k == kind]
+        yield (f"parse_llm_json/{kind}", measure(app.parse_llm_json, subset, len(subset), "replies/s"))
+
+
+def bench_validate(bank_sizes):
+    for size in bank_sizes:
+        bank = make_mcq_bank(size)
+        yield (f"validate_mcq_list/{size}", measure(app.validate_mcq_list, [bank], size, "questions/s"))
+
+
+def bench_dedupe(bank_sizes):
+    for size in bank_sizes:
+        bank = make_mcq_bank_with_duplicates(size)
+        yield (f"dedupe_mcqs/{size}", measure(app.dedupe_mcqs, [bank], size, "questions/s"))
+
+
+STAGES = {
+    "text": lambda quick: bench_text_stages(QUICK_SEGMENT_COUNTS if quick else SEGMENT_COUNTS),
+    "parse_llm_json": lambda quick: bench_parse(90 if quick else 900),
+    "validate_mcq_list": lambda quick: bench_validate((100, 1_000) if quick else (100, 1_000, 10_000)),
+    "dedupe_mcqs": lambda quick: bench_dedupe((100, 1_000) if quick else (100, 1_000, 10_000)),
+}
+
+
+def print_row(name, r, base=None):
+    line = (f"{name:<44}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+            f"{r['throughput']:>14,.1f} {r['unit']:<12}{r['peak_kib']:>10,.0f}")
+    if r["failure_rate"]:
+        line += f"  fail {r['failure_rate']:.0%}"
+    if base:
+        change = (r["p50_ms"] - base["p50_ms"]) / base["p50_ms"] if base["p50_ms"] else 0.0
+        flag = "  REGRESSION" if change > REGRESSION_THRESHOLD else ""
+        line += f"  p50 {change:+.0%}{flag}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stage", choices=sorted(STAGES), action="append",
+                        help="run only these stages (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="small inputs only")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against a previously saved results file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))["results"]
+
+    print(f"{'case':<44}{'p50 ms':>10}{'p99 ms':>10}{'throughput':>14} {'':<12}{'peak KiB':>10}")
+    results = {}
+    regressions = 0
+    for stage in args.stage or list(STAGES):
+        for name, r in STAGES[stage](args.quick):
+            results[name] = r
+            base = baseline.get(name)
+            print_row(name, r, base)
+            if base and base["p50_ms"] and (r["p50_ms"] - base["p50_ms"]) / base["p50_ms"] > REGRESSION_THRESHOLD:
+                regressions += 1
+
+    if args.save:
+        path = Path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "results": results,
+        }, indent=2), encoding="utf-8")
+        print(f"Saved {len(results)} results to {path}")
+    if args.compare:
+        print(f"{regressions} regression(s) above {REGRESSION_THRESHOLD:.0%} vs {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Deterministic synthetic transcripts for offline benchmarks.
+
+Segments mimic what YouTubeTranscriptApi returns (objects with .text,
+.start and .duration) in two styles:
+
+* ``manual``: punctuated sentences, capitalisation, pauses between thoughts
+* ``auto``: lower-case caption lines without punctuation, continuous speech
+  with almost no pauses (a livestream becomes one giant paragraph)
+* ``rolling``: ``auto`` with the noise of real auto-captions: each line
+  repeats the end of the previous one, [Music] tags, filler words and
+  stuttered phrases, plus KEEP_PHRASES (digit runs, units, grammatical
+  repeats) that normalization must leave intact
+"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app import Segment  # noqa: E402
+
+WORDS = (
+    "the of and to in is that it for on with as was this are be by at an from or have "
+    "energy cell protein water pressure temperature system model data signal network "
+    "function value process structure reaction force field layer surface memory theory "
+    "experiment result method analysis particle wave frequency current voltage carbon "
+    "oxygen molecule enzyme membrane gradient equation variable constant measurement"
+).split()
+
+SEGMENTS_PER_HOUR = 1500     # ~2.4 s per caption line
+WORDS_PER_SEGMENT = (4, 12)
+FILLERS = ("um", "uh", "um,", "uh,", "erm", "hmm")
+# Content that looks like noise but is not: repeated digits, units, grammatical repeats
+KEEP_PHRASES = ("the matrix is 1 0 0 1", "binary 1 1 0 1 is thirteen", "a 5 mm bolt",
+                "I had had enough", "said that that was", "is 10 10 percent")
+
+
+def make_segments(count, style="manual", seed=0):
+    """``count`` caption segments in the given style"""
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    sentence_left = rng.randint(8, 25)
+    prev_words = []
+    for _ in range(count):
+        n = rng.randint(*WORDS_PER_SEGMENT)
+        words = [rng.choice(WORDS) for _ in range(n)]
+        if style == "manual":
+            out = []
+            for w in words:
+                if sentence_left <= 0 and out:
+                    out[-1] += rng.choice(".......?!")
+                    sentence_left = rng.randint(8, 25)
+                    w = w.capitalize()
+                out.append(w)
+                sentence_left -= 1
+            text = " ".join(out)
+            gap = rng.choice((0.1, 0.2, 0.3, 0.5, 1.2)) if rng.random() < 0.3 else 0.05
+        elif style == "rolling":
+            noisy = list(words)
+            for _ in range(rng.randint(0, 2)):
+                noisy.insert(rng.randrange(len(noisy) + 1), rng.choice(FILLERS))
+            if rng.random() < 0.1:
+                k = rng.randint(1, 3)
+                at = rng.randrange(len(noisy) - k + 1)
+                noisy[at:at] = noisy[at:at + k]
+            if rng.random() < 0.05:
+                noisy.insert(rng.randrange(len(noisy) + 1), rng.choice(KEEP_PHRASES))
+            if rng.random() < 0.03:
+                noisy.insert(0, "[Music]")
+            text = " ".join(prev_words[-rng.randint(2, 5):] + noisy) if prev_words else " ".join(noisy)
+            prev_words = words
+            gap = 0.0
+        else:
+            text = " ".join(words)
+            gap = 0.0
+        duration = n * 0.3
+        segments.append(Segment(text, round(t, 3), round(duration, 3)))
+        t += duration + gap
+    return segments
+
+
+def make_transcript_hours(hours, style="manual", seed=0):
+    return make_segments(int(hours * SEGMENTS_PER_HOUR), style=style, seed=seed)
+
+
+# --- LLM replies -----------------------------------------------------------
+
+def make_mcq(rng, i):
+    def phrase(k):
+        return " ".join(rng.choice(WORDS) for _ in range(k))
+    return {
+        "question": f"Which {phrase(3)} best describes {phrase(4)}? ({i})",
+        "choices": {k: phrase(rng.randint(2, 6)) for k in "ABCD"},
+        "correct": rng.choice("ABCD"),
+        "explanation": phrase(rng.randint(8, 20)).capitalize() + ".",
+    }
+
+
+def make_mcq_bank(count, seed=0):
+    rng = random.Random(seed)
+    return [make_mcq(rng, i) for i in range(count)]
+
+
+def make_mcq_bank_with_duplicates(count, dup_rate=0.2, seed=0):
+    """A bank where ``dup_rate`` of the questions reword an earlier one (a word swapped, new number)"""
+    rng = random.Random(seed)
+    bank = []
+    for i in range(count):
+        if bank and rng.random() < dup_rate:
+            q = dict(rng.choice(bank))
+            words = q["question"].rsplit(" (", 1)[0].split()
+            words[rng.randrange(1, len(words))] = rng.choice(WORDS)
+            q["question"] = " ".join(words) + f" ({i})"
+            bank.append(q)
+        else:
+            bank.append(make_mcq(rng, i))
+    return bank
+
+
+def _mangle(rng, text, kind):
+    import json
+    if kind == "valid":
+        return text
+    if kind == "prose":
+        return "Here are the questions you asked for:\n\n" + text + "\n\nLet me know if you need more."
+    if kind == "fence":
+        return "```json\n" + text + "\n```"
+    if kind == "trailing_comma":
+        return text.replace("}\n  }", "},\n  }").replace("}\n]", "},\n]")
+    if kind == "single_quotes":
+        return text.replace('"', "'")
+    if kind == "smart_quotes":
+        return text.replace('"', "“", 1).replace('": "', "”: “", 3)
+    if kind == "truncated":
+        return text[: rng.randint(len(text) // 3, len(text) - 5)]
+    if kind == "inner_quotes":
+        obj = json.loads(text)
+        obj[0]["question"] = 'What does the term "gradient" mean here?'
+        raw = json.dumps(obj, ensure_ascii=False, indent=2)
+        return raw.replace('\\"gradient\\"', '"gradient"')
+    if kind == "empty":
+        return "I could not find enough information in the text to write questions."
+    raise ValueError(kind)
+
+
+LLM_OUTPUT_KINDS = ("valid", "prose", "fence", "trailing_comma", "single_quotes",
+                    "smart_quotes", "truncated", "inner_quotes", "empty")
+
+
+def make_llm_outputs(count, seed=0):
+    """``count`` chat replies cycling through the failure modes seen in debug_raw/"""
+    import json
+    rng = random.Random(seed)
+    out = []
+    for i in range(count):
+        kind = LLM_OUTPUT_KINDS[i % len(LLM_OUTPUT_KINDS)]
+        bank = [make_mcq(rng, i * 10 + k) for k in range(rng.randint(1, 5))]
+        text = json.dumps(bank, ensure_ascii=False, indent=2)
+        out.append((kind, _mangle(rng, text, kind)))
+    return out
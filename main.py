@@ -1,275 +1,199 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-from urllib.parse import urlparse, parse_qs
+"""Batch MCQ generation from the command line.
+
+    python main.py --urls videos.txt --lang lv --questions 30 --workers 4
+    python main.py --playlist PLxxxxxxxx
+    python main.py https://www.youtube.com/watch?v=AFXLZ7FEJc4
+
+Videos are processed in parallel with the same pipeline the web app uses.
+Every video's status is recorded in a manifest (out_mcq/manifest.json by
+default), so rerunning the same command after a crash or Ctrl+C skips the
+videos that are already done and redoes the ones a --time-budget cut short.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
-import os, json, re, textwrap, requests
+from types import SimpleNamespace
+import argparse, json, os, re, sys, threading, requests
 
-def extract_video_id(url: str) -> str:
-    q = urlparse(url)
-    if q.hostname in ("www.youtube.com", "youtube.com", "m.youtube.com"):
-        vids = parse_qs(q.query).get("v", [])
-        if vids:
-            return vids[0]
-    if q.hostname == "youtu.be":
-        return q.path.lstrip("/")
-    raise ValueError(f"Nederīgs URL: {url}")
+import app
 
-def get_transcript_new_api(url: str, preferred_langs=("lv","en")):
-    vid = extract_video_id(url)
-    api = YouTubeTranscriptApi()  # jaunajā interfeisā veido instanci
-    tl = api.list(vid)            # NEVIS list_transcripts, bet list(...)
-    # Mēģini manuālos, tad auto, tad jebkuru
-    for lang in preferred_langs:
-        try:
-            t = tl.find_manually_created_transcript([lang])
-            return t.fetch(), t.language_code, "manual"
-        except Exception:
-            pass
-    for lang in preferred_langs:
-        try:
-            t = tl.find_generated_transcript([lang])
-            return t.fetch(), t.language_code, "auto"
-        except Exception:
-            pass
-    # Rezerves varianta paņemšana
-    for t in tl:
-        try:
-            return t.fetch(), t.language_code, ("manual" if not t.is_generated else "auto")
-        except Exception:
-            continue
-    return None, None, "not_found"
-
-# Izsaukums
-url = "https://www.youtube.com/watch?v=AFXLZ7FEJc4"
-segments, lang, source = get_transcript_new_api(url, preferred_langs=("lv","en"))
-print(lang, source, 0 if segments is None else len(segments))
-
-def segments_to_plain_text_objects(segments, join_threshold=0.8):
-    out, buf, last_end = [], [], None
-    for s in segments:
-        start = s.start
-        end = s.start + (s.duration or 0)
-        text = (s.text or "").replace("\n", " ").strip()
-        if not text:
-            continue
-        if last_end is not None and (start - last_end) <= join_threshold:
-            buf.append(text)
-        else:
-            if buf:
-                out.append(" ".join(buf))
-            buf = [text]
-        last_end = end
-    if buf:
-        out.append(" ".join(buf))
-    return "\n\n".join(out)
-
-plain = segments_to_plain_text_objects(segments, join_threshold=0.8)
-print(plain)
-
-
-
-API_KEY = ":) :) :)"
-
-MODEL = "sonar"
+OUT_DIR = Path("out_mcq")
 TARGET_LANG = "lv"
-MAX_TOKENS = 900         # tighter to reduce verbosity
-TEMPERATURE = 0.3        # slightly lower for format adherence
-
-
-# Simple calculation
-plain_length = len(plain)
 TOTAL_QUESTIONS = 30
-
-# Aim for 8-12 chunks (sweet spot for variety vs API calls)
-target_chunks = min(12, max(8, TOTAL_QUESTIONS // 3))
-MAX_CHARS_PER_CHUNK = max(1000, plain_length // target_chunks)
-PER_CHUNK = max(1, (TOTAL_QUESTIONS + target_chunks - 1) // target_chunks)  # ceiling division
-
-print(f"Text: {plain_length:,} chars → {target_chunks} chunks of ~{MAX_CHARS_PER_CHUNK} chars")
-print(f"Strategy: {PER_CHUNK} questions per chunk → up to {target_chunks * PER_CHUNK} total")
-
-
-
-def split_into_chunks(text: str, max_chars: int = 8000, target_chunks=None):
-    # If we have a target chunk count, try to hit it
-    if target_chunks:
-        actual_chunk_size = len(text) // target_chunks
-        max_chars = max(1000, actual_chunk_size)  # minimum 1000 chars
-    
-    paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-    chunks, buf, cur = [], [], 0
-    
-    for p in paras:
-        if cur + len(p) + 2 <= max_chars:
-            buf.append(p); cur += len(p) + 2
-        else:
-            if buf: chunks.append("\n\n".join(buf))
-            buf = [p]; cur = len(p) + 2
-            
-            # If this paragraph alone exceeds max_chars, split it further
-            if cur > max_chars:
-                # Split long paragraphs by sentences or character limits
-                sentences = re.split(r'[.!?]+', p)
-                temp_chunk = ""
-                for sent in sentences:
-                    if len(temp_chunk) + len(sent) < max_chars:
-                        temp_chunk += sent + ". "
-                    else:
-                        if temp_chunk.strip():
-                            chunks.append(temp_chunk.strip())
-                        temp_chunk = sent + ". "
-                if temp_chunk.strip():
-                    buf = [temp_chunk.strip()]
-                    cur = len(temp_chunk)
-                else:
-                    buf = []; cur = 0
-    
-    if buf: chunks.append("\n\n".join(buf))
-    return chunks
-
-chunks = split_into_chunks(plain, max_chars=MAX_CHARS_PER_CHUNK)
-print(f"Chunks: {len(chunks)}, total chars: {sum(len(c) for c in chunks)}")
-
-def call_pplx(model: str, messages, max_tokens=900, temperature=0.3, timeout=120):
-    headers = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
-    payload = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
-    r = requests.post("https://api.perplexity.ai/chat/completions",
-                      headers=headers, data=json.dumps(payload), timeout=timeout)
+WORKERS = int(os.environ.get("MCQ_BATCH_WORKERS", "4"))  # videos in parallel
+
+
+def read_url_file(path):
+    # Viens URL rindā; tukšās rindas un '#' komentāri tiek izlaisti
+    urls = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            urls.append(line)
+    return urls
+
+PLAYLIST_ID_RE = re.compile(r"list=([\w-]+)")
+VIDEO_ID_JSON_RE = re.compile(r'"videoId"\s*:\s*"([\w-]{11})"')
+CONTINUATION_RE = re.compile(r'"continuationCommand"\s*:\s*\{\s*"token"\s*:\s*"([^"]+)"')
+PLAYLIST_MAX_PAGES = 200          # continuation pages of ~100 videos each
+
+def fetch_playlist_urls(playlist_id):
+    # Playlist page scrape, then the continuation pages YouTube's own client requests
+    # for the rest (~100 videos per page)
+    if "list=" in playlist_id:
+        m = PLAYLIST_ID_RE.search(playlist_id)
+        if not m:
+            raise ValueError(f"No playlist id in {playlist_id!r}")
+        playlist_id = m.group(1)
+    session = requests.Session()
+    session.headers["Accept-Language"] = "en"
+    r = session.get("https://www.youtube.com/playlist", params={"list": playlist_id}, timeout=30)
     r.raise_for_status()
-    data = r.json()
-    return data["choices"][0]["message"]["content"], data
-
-def build_mcq_prompt(chunk_text: str, lang="lv", n=3):
-    system = {
-        "role": "system",
-        "content": (
-            "Tu esi eksāmenu satura veidotājs. Izveido kvalitatīvus MCQ (viena pareizā atbilde) no dotā teksta. "
-            "Neizdomā faktus. Atbildei jābūt TIKAI derīgam JSON masīvam."
-        ),
-    }
-    user = {
-        "role": "user",
-        "content": textwrap.dedent(f"""
-        Valoda: {lang}
-        Jautājumu skaits: {n}
-
-        Stingras prasības:
-        - Atgriez TIKAI JSON masīvu (bez citiem simboliem, bez teksta ārpus JSON).
-        - Izmanto dubultpēdiņas gan atslēgām, gan virkņu vērtībām.
-        - Nav lieku komatu rindas beigās.
-        - Nav komentāru vai papildlauku.
-        - Ja pietrūkst informācijas, jautājumu neiekļauj.
-        - Ja nevari 100% izpildīt formātu, atgriez tukšu masīvu [].
-
-        Formāts:
-        [
-          {{
-            "question": "....",
-            "choices": {{"A":"...","B":"...","C":"...","D":"..."}},
-            "correct": "A",
-            "explanation": "Īss pamatojums no dotā teksta."
-          }},
-          ...
-        ]
-
-        Teksts:
-        {chunk_text}
-        """).strip()
-    }
-    return [system, user]
-
-def parse_json_strict(s: str):
-    s = s.strip()
-    if not (s.startswith("[") and s.endswith("]")):
-        raise ValueError("Not a JSON array")
-    return json.loads(s)
-
-def parse_json_repair(s: str):
-    # Minimal plain-text repair (no fence handling)
-    t = s.strip().replace("\r\n", "\n")
-
-    # Remove trailing commas before ] or }
-    t = re.sub(r",\s*([\]}])", r"\1", t)
-
-    # Convert single-quoted keys/values to double quotes (heuristic)
-    t = re.sub(r'(?P<pre>[\{\s,])\'(?P<key>[^\'\n\r\t]+)\'\s*:', r'\g<pre>"\g<key>":', t)
-    t = re.sub(r':\s*\'(?P<val>[^\'\\\n\r]*)\'(?P<post>[\s,\}\]])', r': "\g<val>"\g<post>', t)
-
-    # Isolate first array/object
-    fa, la = t.find("["), t.rfind("]")
-    fo, lo = t.find("{"), t.rfind("}")
-    if fa != -1 and la != -1 and fa < la:
-        t = t[fa:la+1]
-    elif fo != -1 and lo != -1 and fo < lo:
-        t = t[fo:lo+1]
-
-    return json.loads(t)
-
-def validate_mcq_list(mcq_list):
-    ok = True; issues = []
-    for i, q in enumerate(mcq_list, 1):
-        if not isinstance(q, dict):
-            ok=False; issues.append((i,"not dict")); continue
-        if not {"question","choices","correct","explanation"}.issubset(q):
-            ok=False; issues.append((i,"missing keys")); continue
-        ch = q["choices"]
-        if not isinstance(ch, dict) or set(ch.keys()) != {"A","B","C","D"}:
-            ok=False; issues.append((i,"choices format")); continue
-        if q["correct"] not in {"A","B","C","D"} or not ch.get(q["correct"], "").strip():
-            ok=False; issues.append((i,"correct invalid/empty"))
-        if not str(q["question"]).strip():
-            ok=False; issues.append((i,"empty question"))
-        if not str(q["explanation"]).strip():
-            ok=False; issues.append((i,"empty explanation"))
-    return ok, issues
-
-def generate_mcq(chunks, lang="lv", model="sonar", per_chunk=3, total=30,
-                 max_tokens=900, temperature=0.3, log_failed=True):
-    out = []
-    debug_dir = Path("debug_raw"); debug_dir.mkdir(exist_ok=True)
-
-    for i, ch in enumerate(chunks):
-        need = total - len(out)
-        if need <= 0: break
-        ask = min(per_chunk, need)
+    ids = dict.fromkeys(VIDEO_ID_JSON_RE.findall(r.text))
+    key = re.search(r'"INNERTUBE_API_KEY"\s*:\s*"([^"]+)"', r.text)
+    version = re.search(r'"INNERTUBE_CLIENT_VERSION"\s*:\s*"([^"]+)"', r.text)
+    token = CONTINUATION_RE.search(r.text)
+    pages = 1
+    try:
+        while token and key and version and pages < PLAYLIST_MAX_PAGES:
+            r = session.post("https://www.youtube.com/youtubei/v1/browse", params={"key": key.group(1)},
+                             json={"context": {"client": {"clientName": "WEB",
+                                                          "clientVersion": version.group(1)}},
+                                   "continuation": token.group(1)}, timeout=30)
+            r.raise_for_status()
+            ids.update(dict.fromkeys(VIDEO_ID_JSON_RE.findall(r.text)))
+            token = CONTINUATION_RE.search(r.text)
+            pages += 1
+    except requests.RequestException as e:
+        print(f"Warning: playlist {playlist_id} stopped after page {pages} ({e}); "
+              f"only its first {len(ids)} videos are queued")
+    else:
+        if token:
+            print(f"Warning: playlist {playlist_id} has more than {pages} pages; "
+                  f"only its first {len(ids)} videos are queued")
+    return [f"https://www.youtube.com/watch?v={vid}" for vid in ids]
+
+
+class Manifest:
+    """Per-video status, rewritten atomically after every change"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.entries = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+
+    def is_done(self, video_id, lang, questions):
+        e = self.entries.get(video_id)
+        # Partial runs (cut off by --time-budget) are redone, so a rerun completes them
+        return bool(e and e["status"] == "done" and not e.get("partial") and e["lang"] == lang
+                    and e["questions"] == questions and Path(e["output"]).exists())
+
+    def update(self, video_id, **fields):
+        with self.lock:
+            e = self.entries.setdefault(video_id, {})
+            e.update(fields, updated=datetime.now().isoformat(timespec="seconds"))
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+class PrintChannel:
+    # Stands in for a job's EventChannel so pipeline progress goes to stdout
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def publish(self, event, name=None):
+        if name is None:
+            print(f"[{self.prefix}] {event['message']}", flush=True)
+
+
+def process_one(url, video_id, lang, questions, manifest, verbose, time_budget=None):
+    manifest.update(video_id, url=url, lang=lang, questions=questions, status="running", error=None)
+    if verbose:
+        app.current_job.set(SimpleNamespace(events=PrintChannel(video_id)))
+    try:
+        result = app.run_pipeline(url, lang=lang, num_questions=questions, time_budget=time_budget)
+    except Exception as e:
+        manifest.update(video_id, status="failed", error=str(e))
+        raise
+    out_path = OUT_DIR / f"mcq_{video_id}_{lang}_{questions}.json"
+    out_path.write_text(json.dumps(result["mcqs"], ensure_ascii=False, indent=2), encoding="utf-8")
+    partial = result["generation_info"]["partial"]
+    manifest.update(video_id, status="partial" if partial else "done", output=str(out_path),
+                    count=len(result["mcqs"]), validation_ok=result["generation_info"]["validation_ok"],
+                    partial=partial)
+    return len(result["mcqs"]), out_path
+
+
+def positive_seconds(value):
+    seconds = float(value)
+    if not 0 < seconds < float("inf"):
+        raise argparse.ArgumentTypeError(f"must be a positive number of seconds, got {value!r}")
+    return seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate MCQs for many YouTube videos in parallel.")
+    parser.add_argument("urls", nargs="*", help="YouTube video URLs")
+    parser.add_argument("--urls", dest="url_file", help="file with one URL per line")
+    parser.add_argument("--playlist", help="playlist id or URL")
+    parser.add_argument("--lang", default=TARGET_LANG)
+    parser.add_argument("--questions", type=int, default=TOTAL_QUESTIONS)
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="videos processed at once (each also runs MCQ_MAX_CONCURRENCY chunk calls)")
+    parser.add_argument("--time-budget", type=positive_seconds,
+                        help="seconds per video; when exceeded the questions gathered so far are kept")
+    parser.add_argument("--manifest", default=str(OUT_DIR / "manifest.json"))
+    parser.add_argument("-v", "--verbose", action="store_true", help="print pipeline progress")
+    args = parser.parse_args(argv)
+
+    urls = list(args.urls)
+    if args.url_file:
+        urls += read_url_file(args.url_file)
+    if args.playlist:
+        try:
+            urls += fetch_playlist_urls(args.playlist)
+        except ValueError as e:
+            parser.error(str(e))
+    if not urls:
+        parser.error("no videos given (URLs, --urls or --playlist)")
 
-        msgs = build_mcq_prompt(ch, lang=lang, n=ask)
-        content, meta = call_pplx(model, msgs, max_tokens=max_tokens, temperature=temperature)
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(args.manifest)
 
-        parsed = None
+    todo, seen = [], set()
+    for url in urls:
         try:
-            parsed = parse_json_strict(content)
-        except Exception:
-            # try repair
+            vid = app.extract_video_id(url)
+        except ValueError as e:
+            print(f"Skipping: {e}")
+            continue
+        if vid in seen:
+            continue
+        seen.add(vid)
+        if manifest.is_done(vid, args.lang, args.questions):
+            continue
+        todo.append((url, vid))
+
+    print(f"{len(seen)} videos, {len(seen) - len(todo)} already done, {len(todo)} to process "
+          f"({args.workers} in parallel)")
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(process_one, url, vid, args.lang, args.questions, manifest, args.verbose,
+                               args.time_budget): vid
+                   for url, vid in todo}
+        for fut in as_completed(futures):
+            vid = futures[fut]
             try:
-                parsed = parse_json_repair(content)
-            except Exception:
-                if log_failed:
-                    (debug_dir / f"chunk_{i}.txt").write_text(content, encoding="utf-8")
-                print(f"Chunk {i} parse failed, saved raw.")
-                continue
-
-        if isinstance(parsed, dict):
-            parsed = [parsed]
-        if isinstance(parsed, list):
-            out.extend(parsed)
-
-    out = out[:total]
-    ok, issues = validate_mcq_list(out)
-    return out, ok, issues
-
-mcq_list, ok, issues = generate_mcq(
-    chunks, lang=TARGET_LANG, model=MODEL,
-    per_chunk=PER_CHUNK, total=TOTAL_QUESTIONS,
-    max_tokens=MAX_TOKENS, temperature=TEMPERATURE,
-    log_failed=True
-)
-
-print("Valid:", ok, "issues:", issues[:5], "count:", len(mcq_list))
-out_dir = Path("out_mcq"); out_dir.mkdir(parents=True, exist_ok=True)
-(out_dir / f"mcq_{TARGET_LANG}_{TOTAL_QUESTIONS}.json").write_text(
-    json.dumps(mcq_list, ensure_ascii=False, indent=2), encoding="utf-8"
-)
-print("Saved:", out_dir / f"mcq_{TARGET_LANG}_{TOTAL_QUESTIONS}.json")
+                count, path = fut.result()
+                print(f"{vid}: {count} questions -> {path}")
+            except Exception as e:
+                failed += 1
+                print(f"{vid}: FAILED - {e}")
 
+    print(f"Done: {len(todo) - failed} ok, {failed} failed. Manifest: {args.manifest}")
+    return 1 if failed else 0
 
 
+if __name__ == "__main__":
+    sys.exit(main())